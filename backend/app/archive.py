@@ -0,0 +1,311 @@
+"""Hot/cold split of the session history.
+
+Finished sessions older than TOMATE_ARCHIVE_AFTER_DAYS move, with their
+pause card uses, from the main ("hot") database into one SQLite file per
+year under TOMATE_ARCHIVE_DIR. Archive files are ATTACHed on demand as
+``archive_<year>``; the session list and export read them through a UNION
+ALL when the requested range reaches into an archived year. Everything
+else (day views, writes, the incremental export) only sees the hot
+database, so archived sessions are read-only.
+
+``session_archives`` in the hot database records which years exist.
+"""
+
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import Column, Index, MetaData, Table, and_, select, union_all
+
+from . import changes
+from .db import current_database
+from .models import PauseCardUse, Session
+from .rollups import FINISHED_STATES
+
+# 0 disables archiving; maintenance still runs.
+ARCHIVE_AFTER_DAYS = int(os.getenv("TOMATE_ARCHIVE_AFTER_DAYS", "0"))
+# Defaults to archive/ next to the database; tenants always use that.
+ARCHIVE_DIR = os.getenv("TOMATE_ARCHIVE_DIR")
+# Seconds between two maintenance runs in each worker; 0 disables them.
+MAINTENANCE_INTERVAL = float(os.getenv("TOMATE_MAINTENANCE_INTERVAL", "3600"))
+# SQLITE_MAX_ATTACHED in the default SQLite build.
+MAX_ATTACHED = 10
+# Rows sampled per index by ANALYZE; keeps maintenance cheap on big tables.
+ANALYSIS_LIMIT = 1000
+
+_FINISHED = ", ".join(f"'{state}'" for state in FINISHED_STATES)
+_tables: dict = {}
+
+
+def archive_dir() -> str:
+    database = current_database()
+    if ARCHIVE_DIR and not database.key:
+        return ARCHIVE_DIR
+    return os.path.join(os.path.dirname(database.path or "."), "archive")
+
+
+def archive_path(year: int) -> str:
+    return os.path.join(archive_dir(), f"sessions-{year}.db")
+
+
+def schema_name(year: int) -> str:
+    return f"archive_{year}"
+
+
+def _copy_table(table, metadata, schema) -> Table:
+    # Foreign keys are dropped: SQLite resolves them inside the archive file.
+    return Table(
+        table.name,
+        metadata,
+        *(
+            Column(column.name, column.type, primary_key=column.primary_key)
+            for column in table.c
+        ),
+        schema=schema,
+    )
+
+
+def archive_tables(year: int) -> tuple:
+    """(sessions, pause_card_uses) tables of one archive file."""
+    if year not in _tables:
+        metadata = MetaData()
+        schema = schema_name(year)
+        sessions = _copy_table(Session.__table__, metadata, schema)
+        uses = _copy_table(PauseCardUse.__table__, metadata, schema)
+        Index("ix_sessions_date_start_at", sessions.c.date, sessions.c.start_at)
+        _tables[year] = (sessions, uses)
+    return _tables[year]
+
+
+def archived_years(conn, from_date: str = "", to_date: str = "9999") -> list:
+    """Archived years overlapping [from_date, to_date], oldest first.
+
+    The bounds come straight from query strings: one that doesn't start
+    with a year matches no archive, as it matches no hot session.
+    """
+    try:
+        first, last = int(from_date[:4] or 0), int(to_date[:4])
+    except ValueError:
+        return []
+    return [
+        year
+        for (year,) in conn.exec_driver_sql(
+            "SELECT year FROM session_archives WHERE year BETWEEN ? AND ? ORDER BY year",
+            (first, last),
+        )
+    ]
+
+
+def check_attachable(years) -> None:
+    if len(years) > MAX_ATTACHED:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range covers more than {MAX_ATTACHED} archived years",
+        )
+
+
+def attach(conn, years) -> None:
+    """ATTACH the archives of ``years`` to this pooled connection.
+
+    Attachments outlive the checkout, so they are tracked in the pool
+    record and only the missing ones are added. Archives no longer needed
+    are detached first to stay under MAX_ATTACHED.
+    """
+    check_attachable(years)
+    attached = conn.info.setdefault("archive_years", set())
+    missing = [year for year in years if year not in attached]
+    if not missing:
+        return
+    excess = len(attached) + len(missing) - MAX_ATTACHED
+    for year in sorted(attached - set(years))[: max(excess, 0)]:
+        conn.exec_driver_sql(f"DETACH DATABASE {schema_name(year)}")
+        attached.discard(year)
+    for year in missing:
+        conn.exec_driver_sql(
+            f"ATTACH DATABASE ? AS {schema_name(year)}", (archive_path(year),)
+        )
+        attached.add(year)
+
+
+def attach_range(db, from_date: str, to_date: str) -> list:
+    """Attach the archives a [from_date, to_date] read needs; ORM-session flavour.
+
+    Usable with ``AsyncSession.run_sync`` as well.
+    """
+    conn = db.connection()
+    years = archived_years(conn, from_date, to_date)
+    attach(conn, years)
+    return years
+
+
+def archived_max_ids(conn) -> dict:
+    """Highest id of each archived table over every archive file.
+
+    The files are read through their own connections, so this works
+    inside a transaction, where ATTACH is not allowed.
+    """
+    result = {"sessions": 0, "pause_card_uses": 0}
+    for year in archived_years(conn):
+        path = archive_path(year)
+        if not os.path.exists(path):
+            continue
+        archive = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for table in result:
+                found = archive.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+                result[table] = max(result[table], found or 0)
+        finally:
+            archive.close()
+    return result
+
+
+def sessions_union(columns, from_date: str, to_date: str, years):
+    """``columns`` of the sessions in [from_date, to_date], hot and archived.
+
+    ``columns`` are columns of the sessions table; the result is a subquery
+    exposing them under the same names.
+    """
+    parts = [
+        select(*columns).where(and_(Session.date >= from_date, Session.date <= to_date))
+    ]
+    for year in years:
+        sessions, _ = archive_tables(year)
+        parts.append(
+            select(*(sessions.c[column.name] for column in columns)).where(
+                and_(sessions.c.date >= from_date, sessions.c.date <= to_date)
+            )
+        )
+    return union_all(*parts).subquery()
+
+
+def _archive_year(conn, year: int, cutoff: str) -> int:
+    schema = schema_name(year)
+    sessions, uses = archive_tables(year)
+    sessions.metadata.create_all(bind=conn)
+    session_columns = ", ".join(column.name for column in sessions.c)
+    use_columns = ", ".join(column.name for column in uses.c)
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        # Both tables are AUTOINCREMENT, so moved ids are never handed out again.
+        conn.exec_driver_sql(
+            "CREATE TEMP TABLE archiving AS SELECT id, date FROM main.sessions "
+            f"WHERE date BETWEEN ? AND ? AND date < ? AND state IN ({_FINISHED})",
+            (f"{year}-01-01", f"{year}-12-31", cutoff),
+        )
+        moved = conn.exec_driver_sql("SELECT COUNT(*) FROM temp.archiving").scalar()
+        if moved:
+            # The delete triggers would take the moved sessions out of the
+            # rollups; stats keep covering them, so save and restore the rows.
+            conn.exec_driver_sql(
+                "CREATE TEMP TABLE archived_rollups AS SELECT * FROM main.daily_rollups "
+                "WHERE date IN (SELECT date FROM temp.archiving)"
+            )
+            # OR REPLACE: a crash between two files' commits (WAL makes the
+            # multi-file commit non-atomic) is repaired by the next run.
+            conn.exec_driver_sql(
+                f"INSERT OR REPLACE INTO {schema}.sessions ({session_columns}) "
+                f"SELECT {session_columns} FROM main.sessions "
+                "WHERE id IN (SELECT id FROM temp.archiving)"
+            )
+            conn.exec_driver_sql(
+                f"INSERT OR REPLACE INTO {schema}.pause_card_uses ({use_columns}) "
+                f"SELECT {use_columns} FROM main.pause_card_uses "
+                "WHERE session_id IN (SELECT id FROM temp.archiving)"
+            )
+            conn.exec_driver_sql(
+                "DELETE FROM main.pause_card_uses "
+                "WHERE session_id IN (SELECT id FROM temp.archiving)"
+            )
+            conn.exec_driver_sql(
+                "DELETE FROM main.sessions WHERE id IN (SELECT id FROM temp.archiving)"
+            )
+            conn.exec_driver_sql(
+                "DELETE FROM main.daily_rollups "
+                "WHERE date IN (SELECT date FROM temp.archiving)"
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO main.daily_rollups SELECT * FROM temp.archived_rollups"
+            )
+            conn.exec_driver_sql("DROP TABLE temp.archived_rollups")
+            # Archived rows are still served: neither changed nor deleted.
+            changes.forget_rows(
+                conn, "sessions", "SELECT id AS key FROM temp.archiving"
+            )
+            changes.forget_rows(
+                conn,
+                "pause_card_uses",
+                f"SELECT id AS key FROM {schema}.pause_card_uses "
+                "WHERE session_id IN (SELECT id FROM temp.archiving)",
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO main.session_archives "
+                "(year, through_date, session_count, archived_at) "
+                f"SELECT ?, MAX(date), COUNT(*), ? FROM {schema}.sessions "
+                "WHERE true ON CONFLICT (year) DO UPDATE SET "
+                "through_date = excluded.through_date, "
+                "session_count = excluded.session_count, "
+                "archived_at = excluded.archived_at",
+                (year, datetime.utcnow().isoformat(sep=" ", timespec="microseconds")),
+            )
+        conn.exec_driver_sql("DROP TABLE temp.archiving")
+        conn.exec_driver_sql("COMMIT")
+    except BaseException:
+        conn.exec_driver_sql("ROLLBACK")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS temp.archiving")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS temp.archived_rollups")
+        raise
+    return moved
+
+
+def archive_sessions(days: int = ARCHIVE_AFTER_DAYS) -> dict:
+    """Move finished sessions older than ``days`` days to the yearly archives.
+
+    Each year moves in its own transaction. Returns {year: sessions moved}.
+    """
+    database = current_database()
+    if days <= 0 or not database.path or database.path == ":memory:":
+        return {}
+    cutoff = (date.today() - timedelta(days=days)).isoformat()
+    os.makedirs(archive_dir(), exist_ok=True)
+    moved = {}
+    with database.engine.connect() as conn:
+        # Manual transaction control, as in migrations.migrate.
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        years = [
+            int(year)
+            for (year,) in conn.exec_driver_sql(
+                "SELECT DISTINCT substr(date, 1, 4) FROM main.sessions "
+                f"WHERE date < ? AND state IN ({_FINISHED})",
+                (cutoff,),
+            )
+        ]
+        for year in years:
+            attach(conn, [year])
+            moved[year] = _archive_year(conn, year, cutoff)
+    return moved
+
+
+def maintain() -> None:
+    """Refresh planner statistics and hand freed pages back to the OS.
+
+    Archiving keeps the hot database small enough for its working set to
+    stay in the page cache; this keeps the file itself from growing.
+    """
+    with current_database().engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.exec_driver_sql(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.exec_driver_sql("ANALYZE")
+        conn.exec_driver_sql("PRAGMA optimize")
+        # Only effective once auto_vacuum is INCREMENTAL; new databases
+        # get it from SQLITE_PRAGMAS, existing ones after `cli vacuum`.
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            # The pragma frees one page per step and the driver's execute()
+            # steps once; executescript() runs it to completion.
+            conn.connection.dbapi_connection.executescript("PRAGMA incremental_vacuum")
+
+
+def run_maintenance() -> dict:
+    moved = archive_sessions()
+    maintain()
+    return moved
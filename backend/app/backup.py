@@ -0,0 +1,283 @@
+import csv
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import weakref
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, select
+from starlette.background import BackgroundTask
+
+from . import archive
+from .db import current_database
+from .models import PauseCard, PauseCardUse, Session, Settings, Task
+from .serialization import SESSION_COLUMNS
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for compression=zstd
+    zstandard = None
+
+CHUNK_SIZE = 1024 * 1024
+# Rows fetched from the cursor, and serialized per yielded chunk, at a time.
+ROW_BATCH = 1000
+# Pages copied per backup step; between steps SQLite lets writers proceed.
+BACKUP_PAGES = 1024
+MAX_CONCURRENT_EXPORTS = int(os.getenv("TOMATE_MAX_CONCURRENT_EXPORTS", "2"))
+
+COMPRESSIONS = {
+    "none": ("application/octet-stream", ""),
+    "gzip": ("application/gzip", ".gz"),
+    "zstd": ("application/zstd", ".zst"),
+}
+
+# Tables included in incremental exports, with the column that records the
+# last change of a row.
+INCREMENTAL_TABLES = (
+    (Settings, Settings.updated_at),
+    (Task, Task.updated_at),
+    (PauseCard, PauseCard.updated_at),
+    (Session, Session.updated_at),
+    (PauseCardUse, PauseCardUse.used_at),
+)
+
+_slots = threading.BoundedSemaphore(MAX_CONCURRENT_EXPORTS)
+
+
+class ExportSlot:
+    """A reserved export slot and the temp file streamed from it, if any.
+
+    Released once, by whichever comes first: the end of the stream, the
+    response's background task, or the response being garbage collected.
+    A generator only runs its finally once closed, which doesn't happen
+    when the client goes away before or during the stream, or when the
+    response is never sent at all.
+    """
+
+    def __init__(self):
+        # Fail fast with 429 rather than queue behind the running exports.
+        if not _slots.acquire(blocking=False):
+            raise HTTPException(
+                status_code=429,
+                detail="Too many exports in progress",
+                headers={"Retry-After": "5"},
+            )
+        self.path: Optional[str] = None
+        self._lock = threading.Lock()
+        self._released = False
+
+    def bind(self, response):
+        """Release the slot once ``response`` is sent or goes away."""
+        response.background = BackgroundTask(self.release)
+        weakref.finalize(response, self.release)
+        return response
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        try:
+            if self.path:
+                os.unlink(self.path)
+        finally:
+            _slots.release()
+
+
+def check_compression(compression: str) -> None:
+    if compression not in COMPRESSIONS:
+        raise HTTPException(status_code=400, detail="Unknown compression")
+    if compression == "zstd" and zstandard is None:
+        raise HTTPException(status_code=400, detail="zstd is not available")
+
+
+def merge_archives(target) -> None:
+    """Move the archived sessions and pause card uses into a snapshot.
+
+    The snapshot then holds the whole history in its own tables and restores
+    as a single file. Its rollups already count the archived sessions, so
+    they are kept as they were rather than updated by the insert triggers.
+    OR IGNORE: rows archived after the snapshot was taken are in it twice.
+    """
+    years = [year for (year,) in target.execute("SELECT year FROM session_archives")]
+    if not years:
+        return
+    target.execute(
+        "CREATE TEMP TABLE archived_rollups AS SELECT * FROM main.daily_rollups"
+    )
+    for year in years:
+        path = archive.archive_path(year)
+        if not os.path.exists(path):
+            continue
+        target.execute("ATTACH DATABASE ? AS archive", (f"file:{path}?mode=ro",))
+        try:
+            for table in (Session.__table__, PauseCardUse.__table__):
+                columns = ", ".join(column.name for column in table.c)
+                target.execute(
+                    f"INSERT OR IGNORE INTO main.{table.name} ({columns}) "
+                    f"SELECT {columns} FROM archive.{table.name}"
+                )
+            target.commit()
+        finally:
+            target.execute("DETACH DATABASE archive")
+    target.execute("DELETE FROM main.daily_rollups")
+    target.execute("INSERT INTO main.daily_rollups SELECT * FROM temp.archived_rollups")
+    target.execute("DELETE FROM main.session_archives")
+    target.commit()
+
+
+def snapshot_database() -> str:
+    """Copy the live database to a temp file with the online backup API.
+
+    The copy is a consistent point-in-time image that includes the WAL
+    contents, with the archived history merged in (see merge_archives);
+    the caller owns the returned path.
+    """
+    fd, path = tempfile.mkstemp(prefix="tomate-backup-", suffix=".db")
+    os.close(fd)
+    try:
+        target = sqlite3.connect(f"file:{path}", uri=True)
+        try:
+            with current_database().engine.connect() as conn:
+                source = conn.connection.driver_connection
+                source.backup(target, pages=BACKUP_PAGES)
+            # A single file: no -wal left next to the snapshot.
+            target.execute("PRAGMA journal_mode = DELETE")
+            merge_archives(target)
+        finally:
+            target.close()
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def _compressor(compression: str):
+    if compression == "gzip":
+        return zlib.compressobj(wbits=31)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compressobj()
+    return None
+
+
+def compress_chunks(chunks: Iterable[bytes], compression: str) -> Iterator[bytes]:
+    compressor = _compressor(compression)
+    for chunk in chunks:
+        if compressor is None:
+            yield chunk
+            continue
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def _read_file(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as handle:
+        while chunk := handle.read(CHUNK_SIZE):
+            yield chunk
+
+
+def stream_snapshot(slot: ExportSlot, compression: str) -> Iterator[bytes]:
+    """Stream the slot's snapshot file, then delete it and release the slot."""
+    try:
+        yield from compress_chunks(_read_file(slot.path), compression)
+    finally:
+        slot.release()
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _changed_rows(since: Optional[datetime]) -> Iterator[bytes]:
+    with current_database().engine.connect() as conn:
+        for model, changed_at in INCREMENTAL_TABLES:
+            query = select(model.__table__)
+            if since is not None:
+                query = query.where(changed_at > since)
+            query = query.order_by(changed_at)
+            result = conn.execution_options(yield_per=ROW_BATCH).execute(query)
+            buffer = []
+            for row in result.mappings():
+                line = {
+                    "table": model.__tablename__,
+                    "row": {key: _json_value(value) for key, value in row.items()},
+                }
+                buffer.append(json.dumps(line))
+                if len(buffer) == ROW_BATCH:
+                    yield ("\n".join(buffer) + "\n").encode()
+                    buffer = []
+            if buffer:
+                yield ("\n".join(buffer) + "\n").encode()
+
+
+def stream_changes(
+    slot: ExportSlot, since: Optional[datetime], compression: str
+) -> Iterator[bytes]:
+    """Stream rows changed after ``since`` as NDJSON, then release the slot."""
+    try:
+        yield from compress_chunks(_changed_rows(since), compression)
+    finally:
+        slot.release()
+
+
+SESSION_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def stream_sessions(
+    from_date: str, to_date: str, fmt: str, years=()
+) -> Iterator[bytes]:
+    """Stream sessions in [from_date, to_date] without materializing them.
+
+    Rows come straight off a server-side cursor, ROW_BATCH at a time, so
+    memory stays flat however large the range is. ``years`` are the
+    archives to read along with the hot table.
+    """
+    if years:
+        source = archive.sessions_union(SESSION_COLUMNS, from_date, to_date, years)
+        # Each arm walks its own (date, start_at) index and SQLite merges
+        # the sorted streams, so the union doesn't sort either.
+        query = select(*source.c).order_by(
+            source.c.date, source.c.start_at, source.c.id
+        )
+    else:
+        query = (
+            select(*SESSION_COLUMNS)
+            .where(and_(Session.date >= from_date, Session.date <= to_date))
+            # Matches ix_sessions_date_start_at (id is the implicit rowid
+            # suffix), so SQLite walks the index instead of sorting the range.
+            .order_by(Session.date, Session.start_at, Session.id)
+        )
+    names = [column.name for column in SESSION_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer is not None:
+        writer.writerow(names)
+    with current_database().engine.connect() as conn:
+        archive.attach(conn, years)
+        result = conn.execution_options(
+            stream_results=True, yield_per=ROW_BATCH
+        ).execute(query)
+        for rows in result.partitions():
+            for row in rows:
+                values = [_json_value(value) for value in row]
+                if writer is not None:
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(names, values))))
+                    buffer.write("\n")
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
@@ -0,0 +1,157 @@
+"""Delta sync: a global change version stamped on every synced row.
+
+Triggers give each insert, update and delete of the SYNCED_TABLES the next
+version in ``row_versions``, one row per synced row, so the log never
+outgrows the data; deletions stay behind as tombstones. Versions come from
+the ``row_versions`` change marker, a counter that only goes up: archiving
+removes entries from ``row_versions``, so its MAX would hand out versions
+again. SQLite has a single writer, so a version is never visible before
+all the smaller ones.
+"""
+
+from sqlalchemy import Integer, select
+
+from .models import (
+    DailyState,
+    PauseCard,
+    PauseCardUse,
+    RowVersion,
+    Session,
+    Settings,
+    Task,
+)
+
+# Table name -> primary key column.
+SYNCED_TABLES = {
+    "settings": Settings.id,
+    "tasks": Task.id,
+    "sessions": Session.id,
+    "pause_cards": PauseCard.id,
+    "pause_card_uses": PauseCardUse.id,
+    "daily_state": DailyState.date,
+}
+# change_markers row counting the versions handed out.
+COUNTER = "row_versions"
+
+
+def _stamp(table: str, key: str, deleted: int, condition: str = "true") -> str:
+    """Give KEY's row of TABLE the next version."""
+    return (
+        "UPDATE change_markers SET version = version + 1 "
+        f"WHERE table_name = '{COUNTER}' AND {condition}; "
+        "INSERT INTO row_versions (table_name, row_key, version, deleted) "
+        f"SELECT '{table}', {key}, "
+        f"(SELECT version FROM change_markers WHERE table_name = '{COUNTER}'), "
+        f"{deleted} WHERE {condition} "
+        "ON CONFLICT (table_name, row_key) DO UPDATE SET "
+        "version = excluded.version, deleted = excluded.deleted;"
+    )
+
+
+def triggers() -> dict:
+    result = {}
+    for table, column in SYNCED_TABLES.items():
+        key = column.name
+        result[f"trg_{table}_version_insert"] = (
+            f"AFTER INSERT ON {table} BEGIN {_stamp(table, f'NEW.{key}', 0)} END"
+        )
+        result[f"trg_{table}_version_delete"] = (
+            f"AFTER DELETE ON {table} BEGIN {_stamp(table, f'OLD.{key}', 1)} END"
+        )
+        # A changed primary key leaves a tombstone for the old one.
+        result[f"trg_{table}_version_update"] = (
+            f"AFTER UPDATE ON {table} BEGIN "
+            f"{_stamp(table, f'OLD.{key}', 1, f'OLD.{key} IS NOT NEW.{key}')} "
+            f"{_stamp(table, f'NEW.{key}', 0)} END"
+        )
+    return result
+
+
+def install_change_log(conn, replace: bool = False) -> None:
+    """Create the version counter, starting above every stamped version."""
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO change_markers (table_name, version) "
+        f"SELECT '{COUNTER}', COALESCE(MAX(version), 0) FROM row_versions"
+    )
+    for name, body in triggers().items():
+        if replace:
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def backfill_change_log(conn) -> None:
+    """Stamp every existing row, for databases that predate the triggers.
+
+    Rows are numbered once across all the synced tables: versions are
+    unique, so numbering each table from the counter would collide.
+    """
+    rows = " UNION ALL ".join(
+        f"SELECT {position} AS position, '{table}' AS table_name, "
+        f"{column.name} AS row_key FROM {table}"
+        for position, (table, column) in enumerate(SYNCED_TABLES.items())
+    )
+    conn.exec_driver_sql(
+        "INSERT INTO row_versions (table_name, row_key, version, deleted) "
+        "SELECT table_name, row_key, "
+        f"(SELECT version FROM change_markers WHERE table_name = '{COUNTER}') "
+        f"+ ROW_NUMBER() OVER (ORDER BY position, row_key), 0 FROM ({rows})"
+    )
+    conn.exec_driver_sql(
+        "UPDATE change_markers SET version = "
+        "max(version, (SELECT COALESCE(MAX(version), 0) FROM row_versions)) "
+        f"WHERE table_name = '{COUNTER}'"
+    )
+
+
+def changes_since(conn, since: int, limit: int) -> dict:
+    """Rows changed after version ``since``, oldest change first.
+
+    At most ``limit`` changes; ``version`` is the cursor of the next call
+    and ``has_more`` tells whether to make it right away. A row is sent as
+    it is now, which may be newer than its version: applying it again on
+    the next call is harmless.
+    """
+    entries = conn.execute(
+        select(
+            RowVersion.table_name,
+            RowVersion.row_key,
+            RowVersion.version,
+            RowVersion.deleted,
+        )
+        .where(RowVersion.version > since)
+        .order_by(RowVersion.version)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    changed: dict = {}
+    deleted: dict = {}
+    for entry in entries:
+        column = SYNCED_TABLES[entry.table_name]
+        key = int(entry.row_key) if isinstance(column.type, Integer) else entry.row_key
+        target = deleted if entry.deleted else changed
+        target.setdefault(entry.table_name, []).append(key)
+    rows = {}
+    for table, keys in changed.items():
+        column = SYNCED_TABLES[table]
+        result = conn.execute(select(column.table).where(column.in_(keys)))
+        rows[table] = [row._asdict() for row in result]
+    return {
+        "version": entries[-1].version if entries else since,
+        "has_more": has_more,
+        "changed": rows,
+        "deleted": deleted,
+    }
+
+
+def forget_rows(conn, table: str, keys: str) -> None:
+    """Drop the versions of ``table`` rows whose keys ``keys`` selects.
+
+    For deletes that only move rows elsewhere (archiving): clients keep
+    their copy instead of seeing a tombstone, and a full sync no longer
+    counts the rows.
+    """
+    conn.exec_driver_sql(
+        f"DELETE FROM main.row_versions WHERE table_name = '{table}' "
+        f"AND row_key IN (SELECT CAST(key AS TEXT) FROM ({keys}))"
+    )
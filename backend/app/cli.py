@@ -0,0 +1,65 @@
+import argparse
+
+from . import archive, migrations, pause_usage, rollups, search
+from .db import engine
+
+
+def rebuild_pause_usage() -> None:
+    with engine.begin() as conn:
+        pause_usage.rebuild_usage(conn)
+
+
+def rebuild_rollups() -> None:
+    with engine.begin() as conn:
+        years = archive.archived_years(conn)
+        archive.attach(conn, years)
+        rollups.rebuild_rollups(conn, [archive.schema_name(year) for year in years])
+
+
+def rebuild_search() -> None:
+    with engine.begin() as conn:
+        search.rebuild_search_index(conn)
+
+
+def archive_sessions() -> None:
+    for year, moved in archive.archive_sessions().items():
+        print(f"{year}: {moved} sessions archived")
+
+
+def maintain() -> None:
+    archive.maintain()
+
+
+def vacuum() -> None:
+    """Rewrite the database, switching an existing one to incremental vacuum."""
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+
+
+def migrate() -> None:
+    version = migrations.migrate(engine)
+    print(f"schema version {version}")
+
+
+COMMANDS = {
+    "archive": archive_sessions,
+    "maintain": maintain,
+    "migrate": migrate,
+    "rebuild-pause-usage": rebuild_pause_usage,
+    "rebuild-rollups": rebuild_rollups,
+    "rebuild-search": rebuild_search,
+    "vacuum": vacuum,
+}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args(argv)
+    COMMANDS[args.command]()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import json
+from datetime import date as date_type, datetime, timedelta
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+from .models import DayTemplate
+from .schemas import DayTemplateEntry, DayTemplateResponse
+from .utils import parse_time
+
+# Upper bound on the days a single plan-day call may fill.
+MAX_PLAN_DAYS = 366
+
+
+def template_to_response(template: DayTemplate) -> DayTemplateResponse:
+    return DayTemplateResponse(
+        id=template.id,
+        name=template.name,
+        entries=json.loads(template.entries_json),
+        created_at=template.created_at,
+        updated_at=template.updated_at,
+    )
+
+
+def entries_to_json(entries: List[DayTemplateEntry]) -> str:
+    return json.dumps([entry.model_dump() for entry in entries])
+
+
+def _parse_date(value: str) -> date_type:
+    try:
+        return date_type.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date {value!r}")
+
+
+def plan_dates(
+    date_value: Optional[str],
+    from_date: Optional[str],
+    to_date: Optional[str],
+    weekdays: Optional[str],
+) -> List[str]:
+    """Dates a template is applied to: one date, or a range filtered by weekday.
+
+    weekdays is a comma-separated list of ISO weekday numbers (1 = Monday).
+    """
+    if date_value:
+        if from_date or to_date:
+            raise HTTPException(status_code=400, detail="Use date or from/to, not both")
+        start = end = _parse_date(date_value)
+    elif from_date and to_date:
+        start, end = _parse_date(from_date), _parse_date(to_date)
+    else:
+        raise HTTPException(status_code=400, detail="date or from/to is required")
+    if end < start:
+        raise HTTPException(status_code=400, detail="to is before from")
+    if (end - start).days >= MAX_PLAN_DAYS:
+        raise HTTPException(status_code=400, detail="Date range is too long")
+    allowed = None
+    if weekdays:
+        try:
+            allowed = {int(day) for day in weekdays.split(",")}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid weekdays")
+    dates = []
+    current = start
+    while current <= end:
+        if allowed is None or current.isoweekday() in allowed:
+            dates.append(current.isoformat())
+        current += timedelta(days=1)
+    return dates
+
+
+def session_rows(template: DayTemplate, dates: List[str], default_minutes: int):
+    """Planned session rows for every (date, entry) pair, in template order."""
+    entries = json.loads(template.entries_json)
+    times = [parse_time(entry["planned_time"]) for entry in entries]
+    rows = []
+    for date_value in dates:
+        day = date_type.fromisoformat(date_value)
+        for entry, planned_time in zip(entries, times):
+            rows.append(
+                {
+                    "kind": "focus",
+                    "task_id": entry["task_id"],
+                    "title": entry["title"],
+                    "start_at": datetime.combine(day, planned_time),
+                    "planned_minutes": entry["minutes"] or default_minutes,
+                    "state": "planned",
+                    "note": None,
+                    "date": date_value,
+                    "daypart_name": entry["daypart_name"],
+                }
+            )
+    return rows
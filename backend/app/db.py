@@ -1,13 +1,122 @@
-from sqlalchemy import create_engine
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+DATABASE_URL = os.getenv("TOMATE_DATABASE_URL", "sqlite:////data/app.db")
+DATABASE_PATH = make_url(DATABASE_URL).database
+
+# "sync" serves every endpoint from the threadpool; "async" moves the
+# read-heavy endpoints onto an aiosqlite engine so they stop holding a
+# threadpool slot while waiting on SQLite.
+DB_MODE = os.getenv("TOMATE_DB_MODE", "sync")
+ASYNC_DB = DB_MODE == "async"
+
+# pool_size + max_overflow matches Starlette's default threadpool of 40, so
+# sync handlers never wait on the pool rather than on SQLite itself.
+POOL_SIZE = int(os.getenv("TOMATE_DB_POOL_SIZE", "8"))
+MAX_OVERFLOW = int(os.getenv("TOMATE_DB_MAX_OVERFLOW", "32"))
+POOL_TIMEOUT = float(os.getenv("TOMATE_DB_POOL_TIMEOUT", "30"))
+
+# Applied to every new connection. WAL lets readers proceed while a write is
+# in progress, and synchronous=NORMAL is durable under WAL except for the last
+# commits before a power loss.
+SQLITE_PRAGMAS = {
+    # Must come first: it only takes effect before the first table exists.
+    # Lets maintenance return freed pages (e.g. after archiving) to the OS.
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": os.getenv("TOMATE_SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("TOMATE_SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("TOMATE_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # Negative values are KiB: 64 MiB of page cache per connection.
+    "cache_size": int(os.getenv("TOMATE_SQLITE_CACHE_SIZE", "-65536")),
+    "busy_timeout": int(os.getenv("TOMATE_SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": "MEMORY",
+}
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+class Database:
+    """Engines and session factories of one SQLite file.
+
+    ``cache`` holds per-database state that other modules keep in memory
+    (settings snapshot, interval indexes), so it goes away with the
+    database when a tenant is closed.
+    """
+
+    def __init__(self, url: str, key: str = "", pool_size: int = POOL_SIZE):
+        self.key = key
+        self.path = make_url(url).database
+        self.engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            pool_size=pool_size,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+        )
+        event.listen(self.engine, "connect", apply_sqlite_pragmas)
+        self.session_factory = sessionmaker(
+            autocommit=False, autoflush=False, bind=self.engine
+        )
+        self.async_engine = None
+        self.async_session_factory = None
+        if ASYNC_DB:
+            # aiosqlite defaults to NullPool for files, which would reopen the
+            # database (and reapply the pragmas) on every request.
+            self.async_engine = create_async_engine(
+                make_url(url).set(drivername="sqlite+aiosqlite"),
+                poolclass=AsyncAdaptedQueuePool,
+                pool_size=pool_size,
+                max_overflow=MAX_OVERFLOW,
+                pool_timeout=POOL_TIMEOUT,
+            )
+            event.listen(self.async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+            self.async_session_factory = async_sessionmaker(
+                self.async_engine, autoflush=False, expire_on_commit=False
+            )
+        self.cache: dict = {}
+
+    async def close(self) -> None:
+        self.engine.dispose()
+        if self.async_engine is not None:
+            await self.async_engine.dispose()
+
+
+# The database of TOMATE_DATABASE_URL: the only one in single-user mode.
+default = Database(DATABASE_URL)
+engine = default.engine
+SessionLocal = default.session_factory
+async_engine = default.async_engine
+AsyncSessionLocal = default.async_session_factory
+
+# Set per request in multi-tenant mode (see tenants.py).
+_current: ContextVar[Optional[Database]] = ContextVar("database", default=None)
+
+
+def current_database() -> Database:
+    return _current.get() or default
 
-DATABASE_URL = "sqlite:////data/app.db"
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-)
+@contextmanager
+def using(database: Database):
+    """Make ``database`` the current one for the enclosed block."""
+    token = _current.set(database)
+    try:
+        yield database
+    finally:
+        _current.reset(token)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -0,0 +1,45 @@
+import hashlib
+from typing import Optional
+
+from sqlalchemy import select
+
+from .models import ChangeMarker
+
+# Tables whose every insert, update and delete bumps their change marker.
+TRACKED_TABLES = ("tasks", "sessions")
+
+
+def install_change_markers(conn) -> None:
+    """Create the marker rows and the triggers that keep them current.
+
+    Triggers rather than application code, so bulk deletes and writes made
+    by other processes or tools are counted too.
+    """
+    for table in TRACKED_TABLES:
+        conn.exec_driver_sql(
+            "INSERT OR IGNORE INTO change_markers (table_name, version) "
+            f"VALUES ('{table}', 0)"
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_marker_{event.lower()} "
+                f"AFTER {event} ON {table} BEGIN "
+                "UPDATE change_markers SET version = version + 1 "
+                f"WHERE table_name = '{table}'; END"
+            )
+
+
+def marker_query(table: str):
+    return select(ChangeMarker.version).where(ChangeMarker.table_name == table)
+
+
+def make_etag(table: str, version: Optional[int], query_string: str) -> str:
+    params = hashlib.blake2s(query_string.encode(), digest_size=6).hexdigest()
+    return f'W/"{table}-{version or 0}-{params}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {value.strip() for value in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
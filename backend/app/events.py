@@ -0,0 +1,77 @@
+import asyncio
+import json
+import threading
+from typing import Any, Optional
+
+from .db import current_database
+
+QUEUE_SIZE = 256
+
+
+class EventBroker:
+    """Fan out change events to the SSE subscribers of this process.
+
+    Handlers publish from the threadpool, so messages are handed to each
+    subscriber's event loop with call_soon_threadsafe. A subscriber that falls
+    QUEUE_SIZE events behind gets a single "resync" event instead and is
+    expected to reload its state.
+
+    Subscribers only receive the events of their own database (tenant).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: dict[asyncio.Queue, tuple] = {}
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[queue] = (
+                asyncio.get_running_loop(),
+                current_database().key,
+            )
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def publish(
+        self,
+        entity: str,
+        action: str,
+        data: Optional[dict[str, Any]] = None,
+        id: Optional[Any] = None,
+    ) -> None:
+        message = json.dumps(
+            {"entity": entity, "action": action, "id": id, "data": data},
+            separators=(",", ":"),
+        )
+        key = current_database().key
+        with self._lock:
+            subscribers = [
+                (queue, loop)
+                for queue, (loop, tenant) in self._subscribers.items()
+                if tenant == key
+            ]
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(_deliver, queue, message)
+            except RuntimeError:
+                # The subscriber's loop is already closed.
+                self.unsubscribe(queue)
+
+
+RESYNC_MESSAGE = json.dumps({"entity": "resync", "action": "resync"})
+
+
+def _deliver(queue: asyncio.Queue, message: str) -> None:
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC_MESSAGE)
+
+
+broker = EventBroker()
@@ -0,0 +1,173 @@
+import json
+from datetime import datetime
+
+from pydantic import ValidationError
+from sqlalchemy.exc import DBAPIError
+
+from . import pause_usage
+from .db import current_database
+from .models import PauseCard, PauseCardUse, Session, Task
+from .schemas import (
+    ImportLineError,
+    ImportResponse,
+    PauseCardImport,
+    PauseCardUseImport,
+    SessionImport,
+    TaskImport,
+)
+from .settings_store import SettingsSnapshot
+
+# Rows buffered before a chunk is written in its own transaction.
+CHUNK_ROWS = 20000
+MAX_REPORTED_ERRORS = 1000
+
+# Accepted tables, in the order a chunk is written so that references
+# within the same chunk point at rows that already exist.
+IMPORT_TABLES = {
+    "tasks": (Task, TaskImport),
+    "pause_cards": (PauseCard, PauseCardImport),
+    "sessions": (Session, SessionImport),
+    "pause_card_uses": (PauseCardUse, PauseCardUseImport),
+}
+
+
+def _insert_sql(model, schema) -> str:
+    columns = ", ".join(schema.model_fields)
+    placeholders = ", ".join("?" for _ in schema.model_fields)
+    return f"INSERT INTO {model.__tablename__} ({columns}) VALUES ({placeholders})"
+
+
+INSERT_SQL = {
+    table: _insert_sql(model, schema) for table, (model, schema) in IMPORT_TABLES.items()
+}
+
+
+# Rows go straight to the driver, bypassing SQLAlchemy's per-row bind
+# processing (most of the cost of a large executemany), so datetimes are
+# formatted here the way the DateTime column type stores them.
+DATETIME_FIELDS = {
+    table: [
+        name
+        for name, field in schema.model_fields.items()
+        if datetime in (field.annotation, *getattr(field.annotation, "__args__", ()))
+    ]
+    for table, (_, schema) in IMPORT_TABLES.items()
+}
+
+
+class BulkImporter:
+    """Load NDJSON lines of {"table": ..., "row": {...}} in chunked batches.
+
+    The line format is the one /export/changes produces. Invalid lines are
+    recorded and skipped; the rest of the load carries on.
+    """
+
+    def __init__(self, snapshot: SettingsSnapshot):
+        self.snapshot = snapshot
+        # Bound now: lines are fed from threadpool calls.
+        self.engine = current_database().engine
+        self.now = datetime.utcnow()
+        self.pending = {table: [] for table in IMPORT_TABLES}
+        self.pending_count = 0
+        self.inserted = {table: 0 for table in IMPORT_TABLES}
+        self.errors = []
+        self.error_count = 0
+        self.line_no = 0
+
+    def error(self, line_no: int, detail: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(ImportLineError(line=line_no, detail=detail))
+
+    def feed(self, raw: bytes) -> bool:
+        """Parse one line; True once enough rows are buffered to flush."""
+        self.line_no += 1
+        if not raw.strip():
+            return False
+        try:
+            item = json.loads(raw)
+            table = item["table"]
+            if table not in IMPORT_TABLES:
+                self.error(self.line_no, f"Unknown table {table!r}")
+                return False
+            schema = IMPORT_TABLES[table][1]
+            row = self.normalize(table, schema.model_validate(item["row"]))
+        except ValidationError as exc:
+            detail = "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in exc.errors()
+            )
+            self.error(self.line_no, detail)
+            return False
+        except (ValueError, KeyError, TypeError) as exc:
+            self.error(self.line_no, f"Invalid line: {exc}")
+            return False
+        self.pending[table].append((self.line_no, row))
+        self.pending_count += 1
+        return self.pending_count >= CHUNK_ROWS
+
+    def feed_lines(self, lines) -> None:
+        for raw in lines:
+            if self.feed(raw):
+                self.flush()
+
+    def normalize(self, table: str, value) -> tuple:
+        row = value.model_dump()
+        if table in ("tasks", "pause_cards"):
+            row["created_at"] = row["created_at"] or self.now
+            row["updated_at"] = row["updated_at"] or row["created_at"]
+        elif table == "sessions":
+            start_at = row["start_at"]
+            row["date"] = row["date"] or start_at.date().isoformat()
+            if not row["daypart_name"]:
+                row["daypart_name"] = self.snapshot.resolve_daypart_name(start_at)
+            row["updated_at"] = row["updated_at"] or row["end_at"] or start_at
+        elif table == "pause_card_uses":
+            row["date"] = row["date"] or row["used_at"].date().isoformat()
+        for name in DATETIME_FIELDS[table]:
+            if row[name] is not None:
+                row[name] = row[name].isoformat(sep=" ", timespec="microseconds")
+        return tuple(row.values())
+
+    def flush(self) -> None:
+        if not self.pending_count:
+            return
+        try:
+            with self.engine.begin() as conn:
+                for table, rows in self.pending.items():
+                    if rows:
+                        conn.exec_driver_sql(
+                            INSERT_SQL[table], [row for _, row in rows]
+                        )
+            for table, rows in self.pending.items():
+                self.inserted[table] += len(rows)
+        except DBAPIError:
+            # Something in the chunk was rejected (typically a duplicate id):
+            # replay it row by row to pin the error on its line.
+            self.flush_rows()
+        for rows in self.pending.values():
+            rows.clear()
+        self.pending_count = 0
+
+    def flush_rows(self) -> None:
+        with self.engine.begin() as conn:
+            for table, rows in self.pending.items():
+                for line_no, row in rows:
+                    # A failed INSERT only undoes its own statement in
+                    # SQLite; the transaction stays open for the next row.
+                    try:
+                        conn.exec_driver_sql(INSERT_SQL[table], row)
+                    except DBAPIError as exc:
+                        self.error(line_no, str(exc.orig))
+                    else:
+                        self.inserted[table] += 1
+
+    def finish(self) -> ImportResponse:
+        self.flush()
+        if self.inserted["pause_card_uses"]:
+            with self.engine.begin() as conn:
+                pause_usage.rebuild_usage(conn)
+        return ImportResponse(
+            inserted=self.inserted,
+            error_count=self.error_count,
+            errors=sorted(self.errors, key=lambda error: error.line),
+        )
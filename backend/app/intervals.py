@@ -0,0 +1,133 @@
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import etags
+from .db import current_database
+from .models import Session as SessionModel
+
+# Sessions in these states never took up their slot.
+FREE_STATES = ("skipped", "aborted")
+MAX_CACHED_DAYS = 64
+
+
+@dataclass(frozen=True)
+class DayIntervals:
+    """Occupied [start_at, start_at + planned_minutes) slots of one day.
+
+    Intervals are sorted by (start, id); ``max_ends`` is the running maximum
+    of their ends, so every interval that can reach past a given instant
+    lies in a suffix found by bisection.
+    """
+
+    ids: tuple
+    starts: tuple
+    ends: tuple
+    max_ends: tuple
+    # Planned focus sessions in (start_at, id) order, for merge_next.
+    planned_focus: tuple
+
+    @classmethod
+    def from_rows(cls, rows) -> "DayIntervals":
+        ids, starts, ends, planned_focus = [], [], [], []
+        for session_id, start_at, minutes, state, kind in rows:
+            if kind == "focus" and state == "planned":
+                planned_focus.append(session_id)
+            if state in FREE_STATES:
+                continue
+            ids.append(session_id)
+            starts.append(start_at)
+            ends.append(start_at + timedelta(minutes=minutes))
+        return cls(
+            ids=tuple(ids),
+            starts=tuple(starts),
+            ends=tuple(ends),
+            max_ends=tuple(accumulate(ends, max)),
+            planned_focus=tuple(planned_focus),
+        )
+
+    def overlapping(
+        self, start: datetime, end: datetime, exclude_id: Optional[int] = None
+    ) -> List[int]:
+        """Ids of the sessions whose slot intersects [start, end)."""
+        first = bisect_right(self.max_ends, start)
+        last = bisect_left(self.starts, end)
+        return [
+            self.ids[index]
+            for index in range(first, last)
+            if self.ends[index] > start and self.ids[index] != exclude_id
+        ]
+
+    def next_free_slot(
+        self, window_start: datetime, window_end: datetime, minutes: int
+    ) -> Optional[datetime]:
+        """Earliest start in the window where ``minutes`` fit without overlap."""
+        needed = timedelta(minutes=minutes)
+        cursor = window_start
+        index = bisect_right(self.max_ends, cursor)
+        while index < len(self.starts) and self.starts[index] < window_end:
+            if self.starts[index] - cursor >= needed:
+                return cursor
+            cursor = max(cursor, self.ends[index])
+            index += 1
+        if window_end - cursor >= needed:
+            return cursor
+        return None
+
+    def first_planned_focus(self, exclude_id: int) -> Optional[int]:
+        for session_id in self.planned_focus:
+            if session_id != exclude_id:
+                return session_id
+        return None
+
+
+def load_day(db: Session, date_value: str) -> DayIntervals:
+    rows = db.execute(
+        select(
+            SessionModel.id,
+            SessionModel.start_at,
+            SessionModel.planned_minutes,
+            SessionModel.state,
+            SessionModel.kind,
+        )
+        .where(SessionModel.date == date_value)
+        .order_by(SessionModel.start_at, SessionModel.id)
+    )
+    return DayIntervals.from_rows(rows)
+
+
+_lock = threading.Lock()
+
+
+def get_day_intervals(db: Session, date_value: str) -> DayIntervals:
+    """Return the interval index of a day, rebuilding it if sessions changed.
+
+    Entries are tagged with the sessions change marker, which triggers bump
+    on every write from any process. Read it before flushing session
+    changes: the marker a transaction sees after its own writes may be
+    rolled back and later reused for different rows.
+    """
+    # One LRU per database: dates repeat across tenants.
+    cache = current_database().cache.setdefault("intervals", OrderedDict())
+    version = db.execute(etags.marker_query("sessions")).scalar()
+    with _lock:
+        entry = cache.get(date_value)
+        if entry is not None and entry[0] == version:
+            cache.move_to_end(date_value)
+            return entry[1]
+    day = load_day(db, date_value)
+    # Only keep the index if no commit landed while it was being read.
+    if db.execute(etags.marker_query("sessions")).scalar() == version:
+        with _lock:
+            cache[date_value] = (version, day)
+            cache.move_to_end(date_value)
+            while len(cache) > MAX_CACHED_DAYS:
+                cache.popitem(last=False)
+    return day
@@ -1,17 +1,61 @@
+import asyncio
 import json
+import logging
 import os
-from datetime import datetime, date as date_type
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from datetime import datetime, date as date_type, timedelta
+from typing import List, Literal, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Query
+import orjson
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from sqlalchemy import and_, func
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    and_,
+    case,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .db import Base, SessionLocal, engine
+from . import (
+    archive,
+    backup,
+    changes,
+    day_templates,
+    etags,
+    intervals,
+    metrics,
+    migrations,
+    pause_usage,
+    rollups,
+    search,
+    serialization,
+    tenants,
+)
+from .db import (
+    ASYNC_DB,
+    async_engine,
+    current_database,
+    engine,
+    using,
+)
+from .events import broker
+from .importer import BulkImporter
+from .pagination import MAX_PAGE_SIZE, keyset, next_cursor
 from .models import (
     DailyState,
+    DayTemplate,
     PauseCard,
     PauseCardUse,
     Session as SessionModel,
@@ -19,11 +63,22 @@ from .models import (
     Task,
 )
 from .schemas import (
+    BatchRequest,
+    BatchResponse,
+    BatchResult,
+    BootstrapResponse,
+    ChangesResponse,
     DailyStateResponse,
+    DayTemplateCreate,
+    DayTemplateResponse,
+    DayTemplateUpdate,
+    ImportResponse,
+    NextSlotResponse,
     PauseCardCreate,
     PauseCardResponse,
     PauseCardUpdate,
     PauseConsume,
+    SearchHit,
     SessionAdjust,
     SessionPlan,
     SessionResponse,
@@ -31,26 +86,71 @@ from .schemas import (
     SessionUpdate,
     SettingsResponse,
     SettingsUpdate,
+    StatsRow,
     TaskCreate,
     TaskResponse,
     TaskUpdate,
+    TimeOfDay,
 )
-from .utils import build_datetime, resolve_daypart_name
+from .settings_store import (
+    get_or_create_settings,
+    get_settings_snapshot,
+    invalidate_settings_snapshot,
+)
+from .utils import build_datetime
 
-Base.metadata.create_all(bind=engine)
 
+logger = logging.getLogger(__name__)
 
-def ensure_schema():
-    with engine.connect() as conn:
-        result = conn.exec_driver_sql("PRAGMA table_info(sessions);")
-        columns = {row[1] for row in result}
-        if "title" not in columns:
-            conn.exec_driver_sql("ALTER TABLE sessions ADD COLUMN title VARCHAR;")
+metrics.instrument_engine(engine)
+if async_engine is not None:
+    metrics.instrument_engine(async_engine.sync_engine)
 
 
-ensure_schema()
+def run_maintenance() -> None:
+    if not tenants.MULTI_TENANT:
+        archive.run_maintenance()
+        return
+    # Only the tenants open in this worker; the others see no writes.
+    for tenant in tenants.registry.open_tenants():
+        if tenant.migrated:
+            with using(tenant.database):
+                archive.run_maintenance()
+
+
+async def run_maintenance_periodically() -> None:
+    while True:
+        await asyncio.sleep(archive.MAINTENANCE_INTERVAL)
+        try:
+            await run_in_threadpool(run_maintenance)
+            if tenants.MULTI_TENANT:
+                await tenants.close_databases(tenants.registry.sweep())
+        except Exception:
+            logger.exception("Database maintenance failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not tenants.MULTI_TENANT:
+        # Tenant databases are migrated on their first request instead.
+        await run_in_threadpool(migrations.migrate, engine)
+    maintenance = None
+    if archive.MAINTENANCE_INTERVAL > 0:
+        maintenance = asyncio.create_task(run_maintenance_periodically())
+    yield
+    if maintenance is not None:
+        maintenance.cancel()
+    if tenants.MULTI_TENANT:
+        await tenants.close_databases(
+            [tenant.database for tenant in tenants.registry.open_tenants()]
+        )
 
-app = FastAPI(title="Tomate API", version="0.1.0")
+
+app = FastAPI(title="Tomate API", version="0.1.0", lifespan=lifespan)
+
+if tenants.MULTI_TENANT:
+    app.add_middleware(tenants.TenantMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -58,23 +158,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "ETag",
+        "X-Next-Cursor",
+        "X-Session-Overlaps",
+        "X-DB-Queries",
+        "X-DB-Time-Ms",
+    ],
 )
 
 
-def get_db():
-    db = SessionLocal()
+async def get_db():
+    # Declared async so the cleanup runs on the event loop: a sync generator
+    # needs a threadpool slot to close the session, and under load every slot
+    # can be held by handlers waiting for the connection that close() would
+    # release.
+    db = current_database().session_factory()
     try:
         yield db
     finally:
         db.close()
 
 
-def default_dayparts():
-    return [
-        {"name": "Matin", "start": "09:00", "end": "12:00"},
-        {"name": "Apres-midi", "start": "13:00", "end": "17:00"},
-        {"name": "Soir", "start": "21:30", "end": "00:00"},
-    ]
+async def get_async_db():
+    async with current_database().async_session_factory() as db:
+        yield db
 
 
 def settings_to_response(settings: Settings, needs_setup: bool) -> SettingsResponse:
@@ -88,63 +196,364 @@ def settings_to_response(settings: Settings, needs_setup: bool) -> SettingsRespo
     )
 
 
-def get_or_create_settings(db: Session) -> tuple[Settings, bool]:
-    settings = db.query(Settings).first()
-    if settings:
-        return settings, False
-    settings = Settings(
-        dayparts_json=json.dumps(default_dayparts()),
-        default_focus_minutes=45,
-        default_break_minutes=5,
-        notifications_enabled=True,
-        sound_enabled=True,
-    )
-    db.add(settings)
+def get_daily_state(db: Session, date_value: str) -> DailyState:
+    state = db.query(DailyState).filter(DailyState.date == date_value).first()
+    if state:
+        return state
+    state = DailyState(date=date_value, pause_due_minutes=0)
+    db.add(state)
     db.commit()
-    db.refresh(settings)
-    seed_pause_cards(db)
-    return settings, True
+    db.refresh(state)
+    return state
 
 
-def seed_pause_cards(db: Session) -> None:
-    existing = db.query(PauseCard).count()
-    if existing > 0:
-        return
-    cards = [
-        PauseCard(name="Cafe", daily_quota=2, is_joker=False),
-        PauseCard(name="Toilettes", daily_quota=2, is_joker=False),
-        PauseCard(name="Etirements", daily_quota=2, is_joker=False),
-        PauseCard(name="Joker", daily_quota=1, is_joker=True),
-    ]
-    db.add_all(cards)
-    db.commit()
+def consume_pause_due(db: Session, date_value: str, minutes: int) -> int:
+    """Take a break's minutes off the day's pause due; return what is left."""
+    due = DailyState.pause_due_minutes
+    remaining = case((due > 0, func.max(0, due - minutes)), else_=due)
+    stmt = sqlite_insert(DailyState).values(date=date_value, pause_due_minutes=0)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyState.date], set_={"pause_due_minutes": remaining}
+    ).returning(due)
+    return db.execute(stmt).scalar_one()
 
 
-def get_daily_state(db: Session, date_value: str) -> DailyState:
-    state = db.query(DailyState).filter(DailyState.date == date_value).first()
+async def get_daily_state_async(db: AsyncSession, date_value: str) -> DailyState:
+    state = await db.get(DailyState, date_value)
     if state:
         return state
     state = DailyState(date=date_value, pause_due_minutes=0)
     db.add(state)
-    db.commit()
-    db.refresh(state)
+    await db.commit()
     return state
 
 
-def compute_actual_minutes(start_at: datetime, end_at: datetime) -> int:
-    delta_seconds = max(0, int((end_at - start_at).total_seconds()))
-    minutes = max(1, int(round(delta_seconds / 60)))
-    return minutes
+def tasks_query(
+    status: Optional[str],
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    columns: tuple = (Task,),
+):
+    query = select(*columns)
+    if status:
+        query = query.where(Task.status == status)
+    return keyset(query, Task.created_at, Task.id, after, limit, descending=True)
+
+
+def sessions_range_query(
+    from_date: str,
+    to_date: str,
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    columns: tuple = (SessionModel,),
+    years=(),
+):
+    """Sessions in [from_date, to_date]; ``years`` adds attached archives."""
+    if years:
+        source = archive.sessions_union(columns, from_date, to_date, years)
+        # Labelled so the row keys are plain str, as orjson requires.
+        query = select(*(source.c[column.name].label(column.name) for column in columns))
+        return keyset(query, source.c.start_at, source.c.id, after, limit)
+    query = select(*columns).where(
+        and_(SessionModel.date >= from_date, SessionModel.date <= to_date)
+    )
+    return keyset(query, SessionModel.start_at, SessionModel.id, after, limit)
+
+
+def list_response(etag: str, rows, order_attr: str, limit: Optional[int]) -> Response:
+    """Encode column rows straight to JSON, with the ETag and next cursor."""
+    headers = {"ETag": etag}
+    cursor = next_cursor(rows, order_attr, limit)
+    if cursor:
+        headers["X-Next-Cursor"] = cursor
+    return serialization.json_response(serialization.rows_to_json(rows), headers)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def pause_card_to_response(card: PauseCard, used: int) -> PauseCardResponse:
+    return PauseCardResponse(
+        id=card.id,
+        name=card.name,
+        daily_quota=card.daily_quota,
+        is_joker=card.is_joker,
+        created_at=card.created_at,
+        remaining_today=max(0, card.daily_quota - used),
+    )
+
+
+def get_task_or_404(db: Session, task_id: int) -> Task:
+    task = db.query(Task).filter(Task.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task
+
+
+def get_session_or_404(db: Session, session_id: int) -> SessionModel:
+    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+def apply_create_task(db: Session, payload: TaskCreate) -> Task:
+    task = Task(
+        title=payload.title,
+        estimate_pomodoros=payload.estimate_pomodoros,
+        note=payload.note,
+    )
+    db.add(task)
+    return task
+
+
+def apply_update_task(db: Session, task_id: int, payload: TaskUpdate) -> Task:
+    task = get_task_or_404(db, task_id)
+    for field, value in payload.model_dump(exclude_unset=True).items():
+        setattr(task, field, value)
+    return task
+
+
+def apply_complete_task(db: Session, task_id: int) -> Task:
+    task = get_task_or_404(db, task_id)
+    task.status = "done"
+    return task
+
+
+def apply_plan_session(db: Session, payload: SessionPlan) -> SessionModel:
+    if payload.kind != "focus":
+        raise HTTPException(
+            status_code=400, detail="Only focus sessions can be planned"
+        )
+    settings = get_settings_snapshot(db)
+    minutes = payload.minutes or settings.default_focus_minutes
+    start_at = build_datetime(payload.date, payload.planned_time)
+    session = SessionModel(
+        kind=payload.kind,
+        task_id=payload.task_id,
+        title=payload.title,
+        start_at=start_at,
+        planned_minutes=minutes,
+        state="planned",
+        note=None,
+        date=payload.date,
+        daypart_name=payload.daypart_name,
+    )
+    db.add(session)
+    return session
+
+
+def apply_update_session(
+    db: Session, session_id: int, payload: SessionUpdate
+) -> SessionModel:
+    session = get_session_or_404(db, session_id)
+    updates = payload.model_dump(exclude_unset=True)
+    planned_time = updates.pop("planned_time", None)
+    for field, value in updates.items():
+        setattr(session, field, value)
+    if planned_time:
+        session.start_at = build_datetime(session.date, planned_time)
+    return session
+
+
+def check_overlaps(
+    db: Session, session: SessionModel, policy: str, response: Response
+) -> None:
+    """Reject (409) or flag in a header a session that collides with others."""
+    if session.state in intervals.FREE_STATES:
+        return
+    day = intervals.get_day_intervals(db, session.date)
+    end_at = session.start_at + timedelta(minutes=session.planned_minutes)
+    overlaps = day.overlapping(session.start_at, end_at, exclude_id=session.id)
+    if not overlaps:
+        return
+    if policy == "reject":
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Session overlaps", "overlaps": overlaps},
+        )
+    response.headers["X-Session-Overlaps"] = ",".join(map(str, overlaps))
+
+
+def transition_session(
+    db: Session, session_id: int, values: dict, *conditions
+) -> Optional[SessionModel]:
+    """Apply ``values`` to a session in a single UPDATE ... RETURNING.
+
+    ``conditions`` guard the transition in the same statement, so when two
+    requests race only one of them matches the row; None means none did.
+    The returned object is refreshed in the identity map, no SELECT needed.
+    """
+    statement = (
+        update(SessionModel)
+        .where(SessionModel.id == session_id, *conditions)
+        .values(**values)
+        .returning(SessionModel)
+        .execution_options(populate_existing=True)
+    )
+    return db.scalars(statement).one_or_none()
+
+
+def transition_error(db: Session, session_id: int, detail: str) -> HTTPException:
+    """404 if the session is gone, otherwise 400: it was in the wrong state."""
+    exists = db.scalar(select(SessionModel.id).where(SessionModel.id == session_id))
+    if exists is None:
+        return HTTPException(status_code=404, detail="Session not found")
+    return HTTPException(status_code=400, detail=detail)
 
 
-@app.get("/api/v1/daily-state", response_model=DailyStateResponse)
-def read_daily_state(
+def actual_minutes_sql(end_at: datetime):
+    """Whole minutes from the row's start_at to ``end_at``, at least one.
+
+    julianday() keeps milliseconds; Python's round() is half-to-even, hence
+    the explicit tie-break on exactly 30 seconds.
+    """
+    elapsed = func.julianday(literal(end_at, DateTime)) - func.julianday(
+        SessionModel.start_at
+    )
+    seconds = func.max(0, cast(func.round(elapsed * 86400000), Integer) // 1000)
+    rounded = seconds // 60 + case(
+        (seconds % 60 > 30, 1),
+        (and_(seconds % 60 == 30, seconds // 60 % 2 == 1), 1),
+        else_=0,
+    )
+    return func.max(1, rounded)
+
+
+def apply_adjust_session(
+    db: Session, session_id: int, payload: SessionAdjust
+) -> SessionModel:
+    values = {
+        "planned_minutes": func.max(
+            1, SessionModel.planned_minutes + payload.minutes_delta
+        )
+    }
+    session = transition_session(db, session_id, values)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+def apply_skip_session(db: Session, session_id: int) -> SessionModel:
+    values = {"state": "skipped", "end_at": datetime.utcnow(), "actual_minutes": 0}
+    session = transition_session(db, session_id, values)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+def apply_reset_session(db: Session, session_id: int) -> Optional[SessionModel]:
+    """Delete a planned session or abort any other; None means deleted.
+
+    Both statements are guarded on the state, so a session that changes
+    between them is neither aborted while planned nor deleted once started.
+    """
+    values = {"state": "aborted", "end_at": datetime.utcnow(), "actual_minutes": 0}
+    session = transition_session(
+        db, session_id, values, SessionModel.state != "planned"
+    )
+    if session is not None:
+        return session
+    deleted = db.scalar(
+        delete(SessionModel)
+        .where(SessionModel.id == session_id, SessionModel.state == "planned")
+        .returning(SessionModel.id)
+    )
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return None
+
+
+def publish_task(task: Task) -> None:
+    data = TaskResponse.model_validate(task).model_dump(mode="json")
+    broker.publish("task", "updated", data, id=task.id)
+
+
+def publish_session(session: SessionModel) -> None:
+    data = SessionResponse.model_validate(session).model_dump(mode="json")
+    broker.publish("session", "updated", data, id=session.id)
+
+
+def commit_session(db: Session, session: SessionModel) -> SessionResponse:
+    """Commit and publish a session returned by a transition statement.
+
+    It is serialized first: the commit expires it, and reading it back
+    afterwards would cost a SELECT.
+    """
+    response = SessionResponse.model_validate(session)
+    db.commit()
+    broker.publish(
+        "session", "updated", response.model_dump(mode="json"), id=response.id
+    )
+    return response
+
+
+def publish_pause_card(response: PauseCardResponse) -> None:
+    broker.publish(
+        "pause_card", "updated", response.model_dump(mode="json"), id=response.id
+    )
+
+
+def publish_daily_state(state: DailyState) -> None:
+    data = {"date": state.date, "pause_due_minutes": state.pause_due_minutes}
+    broker.publish("daily_state", "updated", data, id=state.date)
+
+
+if ASYNC_DB:
+
+    @app.get("/api/v1/daily-state", response_model=DailyStateResponse)
+    async def read_daily_state(
+        date: Optional[str] = Query(default=None),
+        db: AsyncSession = Depends(get_async_db),
+    ):
+        date_value = date or date_type.today().isoformat()
+        state = await get_daily_state_async(db, date_value)
+        return DailyStateResponse(
+            date=state.date, pause_due_minutes=state.pause_due_minutes
+        )
+
+else:
+
+    @app.get("/api/v1/daily-state", response_model=DailyStateResponse)
+    def read_daily_state(
+        date: Optional[str] = Query(default=None), db: Session = Depends(get_db)
+    ):
+        date_value = date or date_type.today().isoformat()
+        state = get_daily_state(db, date_value)
+        return DailyStateResponse(
+            date=state.date, pause_due_minutes=state.pause_due_minutes
+        )
+
+
+@app.get("/api/v1/bootstrap", response_model=BootstrapResponse)
+def bootstrap(
     date: Optional[str] = Query(default=None), db: Session = Depends(get_db)
 ):
+    """Everything the UI needs for one day, from a single DB session."""
     date_value = date or date_type.today().isoformat()
-    state = get_daily_state(db, date_value)
-    return DailyStateResponse(
-        date=state.date, pause_due_minutes=state.pause_due_minutes
+    today = date_type.today().isoformat()
+    settings, needs_setup = get_or_create_settings(db)
+    # Read without get_daily_state, whose commit would make this GET a
+    # write and expire the settings: a day without a row has nothing due.
+    state = db.get(DailyState, date_value)
+    years = archive.attach_range(db, date_value, date_value)
+    sessions = db.execute(
+        sessions_range_query(
+            date_value, date_value, columns=serialization.SESSION_COLUMNS, years=years
+        )
+    ).all()
+    return BootstrapResponse(
+        settings=settings_to_response(settings, needs_setup),
+        tasks=db.scalars(tasks_query(None)).all(),
+        pause_cards=[
+            pause_card_to_response(card, used)
+            for card, used in pause_usage.list_cards_with_usage(db, today)
+        ],
+        sessions=sessions,
+        daily_state=DailyStateResponse(
+            date=date_value, pause_due_minutes=state.pause_due_minutes if state else 0
+        ),
     )
 
 
@@ -162,68 +571,147 @@ def update_settings(payload: SettingsUpdate, db: Session = Depends(get_db)):
     settings.default_break_minutes = payload.default_break_minutes
     settings.notifications_enabled = payload.notifications_enabled
     settings.sound_enabled = payload.sound_enabled
+    # Incremented by the UPDATE: concurrent writers each get their own version.
+    settings.version = Settings.version + 1
     db.commit()
     db.refresh(settings)
-    return settings_to_response(settings, False)
-
-
-@app.get("/api/v1/tasks", response_model=List[TaskResponse])
-def list_tasks(
-    status: Optional[str] = Query(default=None), db: Session = Depends(get_db)
-):
-    query = db.query(Task)
-    if status:
-        query = query.filter(Task.status == status)
-    return query.order_by(Task.created_at.desc()).all()
+    invalidate_settings_snapshot()
+    response = settings_to_response(settings, False)
+    broker.publish("settings", "updated", response.model_dump(mode="json"))
+    return response
+
+
+if ASYNC_DB:
+
+    @app.get("/api/v1/tasks", response_model=List[TaskResponse])
+    async def list_tasks(
+        request: Request,
+        status: Optional[str] = Query(default=None),
+        after: Optional[str] = Query(default=None),
+        limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+        if_none_match: Optional[str] = Header(default=None),
+        db: AsyncSession = Depends(get_async_db),
+    ):
+        version = (await db.execute(etags.marker_query("tasks"))).scalar()
+        etag = etags.make_etag("tasks", version, request.url.query)
+        if etags.etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        query = tasks_query(status, after, limit, serialization.TASK_COLUMNS)
+        rows = (await db.execute(query)).all()
+        return list_response(etag, rows, "created_at", limit)
+
+else:
+
+    @app.get("/api/v1/tasks", response_model=List[TaskResponse])
+    def list_tasks(
+        request: Request,
+        status: Optional[str] = Query(default=None),
+        after: Optional[str] = Query(default=None),
+        limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+        if_none_match: Optional[str] = Header(default=None),
+        db: Session = Depends(get_db),
+    ):
+        version = db.execute(etags.marker_query("tasks")).scalar()
+        etag = etags.make_etag("tasks", version, request.url.query)
+        if etags.etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        query = tasks_query(status, after, limit, serialization.TASK_COLUMNS)
+        rows = db.execute(query).all()
+        return list_response(etag, rows, "created_at", limit)
 
 
 @app.post("/api/v1/tasks", response_model=TaskResponse)
 def create_task(payload: TaskCreate, db: Session = Depends(get_db)):
-    task = Task(
-        title=payload.title,
-        estimate_pomodoros=payload.estimate_pomodoros,
-        note=payload.note,
-    )
-    db.add(task)
+    task = apply_create_task(db, payload)
     db.commit()
     db.refresh(task)
+    publish_task(task)
     return task
 
 
 @app.put("/api/v1/tasks/{task_id}", response_model=TaskResponse)
 def update_task(task_id: int, payload: TaskUpdate, db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    for field, value in payload.model_dump(exclude_unset=True).items():
-        setattr(task, field, value)
+    task = apply_update_task(db, task_id, payload)
     db.commit()
     db.refresh(task)
+    publish_task(task)
     return task
 
 
 @app.post("/api/v1/tasks/{task_id}/complete", response_model=TaskResponse)
 def complete_task(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    task.status = "done"
+    task = apply_complete_task(db, task_id)
     db.commit()
     db.refresh(task)
+    publish_task(task)
     return task
 
 
-@app.get("/api/v1/sessions", response_model=List[SessionResponse])
-def list_sessions(
+if ASYNC_DB:
+
+    @app.get("/api/v1/sessions", response_model=List[SessionResponse])
+    async def list_sessions(
+        request: Request,
+        from_date: str = Query(..., alias="from"),
+        to_date: str = Query(..., alias="to"),
+        after: Optional[str] = Query(default=None),
+        limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+        if_none_match: Optional[str] = Header(default=None),
+        db: AsyncSession = Depends(get_async_db),
+    ):
+        version = (await db.execute(etags.marker_query("sessions"))).scalar()
+        etag = etags.make_etag("sessions", version, request.url.query)
+        if etags.etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        years = await db.run_sync(archive.attach_range, from_date, to_date)
+        query = sessions_range_query(
+            from_date, to_date, after, limit, serialization.SESSION_COLUMNS, years
+        )
+        rows = (await db.execute(query)).all()
+        return list_response(etag, rows, "start_at", limit)
+
+else:
+
+    @app.get("/api/v1/sessions", response_model=List[SessionResponse])
+    def list_sessions(
+        request: Request,
+        from_date: str = Query(..., alias="from"),
+        to_date: str = Query(..., alias="to"),
+        after: Optional[str] = Query(default=None),
+        limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+        if_none_match: Optional[str] = Header(default=None),
+        db: Session = Depends(get_db),
+    ):
+        version = db.execute(etags.marker_query("sessions")).scalar()
+        etag = etags.make_etag("sessions", version, request.url.query)
+        if etags.etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        years = archive.attach_range(db, from_date, to_date)
+        query = sessions_range_query(
+            from_date, to_date, after, limit, serialization.SESSION_COLUMNS, years
+        )
+        rows = db.execute(query).all()
+        return list_response(etag, rows, "start_at", limit)
+
+
+@app.get("/api/v1/sessions/export")
+def export_sessions(
     from_date: str = Query(..., alias="from"),
     to_date: str = Query(..., alias="to"),
+    format: str = "ndjson",
     db: Session = Depends(get_db),
 ):
-    return (
-        db.query(SessionModel)
-        .filter(and_(SessionModel.date >= from_date, SessionModel.date <= to_date))
-        .order_by(SessionModel.start_at.asc())
-        .all()
+    media_type = backup.SESSION_FORMATS.get(format)
+    if media_type is None:
+        raise HTTPException(status_code=400, detail="Unknown format")
+    # Checked here: once streaming has started the status can't change.
+    years = archive.archived_years(db.connection(), from_date, to_date)
+    archive.check_attachable(years)
+    filename = f"sessions-{from_date}-{to_date}.{format}"
+    return StreamingResponse(
+        backup.stream_sessions(from_date, to_date, format, years),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
@@ -233,10 +721,9 @@ def start_session(payload: SessionStart, db: Session = Depends(get_db)):
         raise HTTPException(
             status_code=400, detail="Use /pause/consume to start breaks"
         )
-    settings, _ = get_or_create_settings(db)
+    settings = get_settings_snapshot(db)
     minutes = payload.minutes or settings.default_focus_minutes
     now = datetime.utcnow()
-    dayparts = json.loads(settings.dayparts_json)
     session = SessionModel(
         kind=payload.kind,
         task_id=payload.task_id,
@@ -246,113 +733,145 @@ def start_session(payload: SessionStart, db: Session = Depends(get_db)):
         state="running",
         note=None,
         date=now.date().isoformat(),
-        daypart_name=resolve_daypart_name(dayparts, now),
+        daypart_name=settings.resolve_daypart_name(now),
     )
     db.add(session)
     db.commit()
     db.refresh(session)
+    publish_session(session)
     return session
 
 
 @app.post("/api/v1/sessions/plan", response_model=SessionResponse)
-def plan_session(payload: SessionPlan, db: Session = Depends(get_db)):
-    if payload.kind != "focus":
-        raise HTTPException(
-            status_code=400, detail="Only focus sessions can be planned"
-        )
-    settings, _ = get_or_create_settings(db)
-    minutes = payload.minutes or settings.default_focus_minutes
-    start_at = build_datetime(payload.date, payload.planned_time)
-    session = SessionModel(
-        kind=payload.kind,
-        task_id=payload.task_id,
-        title=payload.title,
-        start_at=start_at,
-        planned_minutes=minutes,
-        state="planned",
-        note=None,
-        date=payload.date,
-        daypart_name=payload.daypart_name,
-    )
-    db.add(session)
+def plan_session(
+    payload: SessionPlan,
+    response: Response,
+    overlap: Literal["warn", "reject"] = "warn",
+    db: Session = Depends(get_db),
+):
+    session = apply_plan_session(db, payload)
+    check_overlaps(db, session, overlap, response)
     db.commit()
     db.refresh(session)
+    publish_session(session)
     return session
 
 
+@app.post("/api/v1/sessions/plan-day", response_model=List[SessionResponse])
+def plan_day(
+    template: int,
+    date: Optional[str] = None,
+    from_date: Optional[str] = Query(default=None, alias="from"),
+    to_date: Optional[str] = Query(default=None, alias="to"),
+    weekdays: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    day_template = get_day_template_or_404(db, template)
+    dates = day_templates.plan_dates(date, from_date, to_date, weekdays)
+    settings = get_settings_snapshot(db)
+    rows = day_templates.session_rows(
+        day_template, dates, settings.default_focus_minutes
+    )
+    if not rows:
+        return []
+    sessions = db.scalars(insert(SessionModel).returning(SessionModel), rows).all()
+    # Serialized before the commit, which would expire every row.
+    responses = [SessionResponse.model_validate(session) for session in sessions]
+    db.commit()
+    for response in responses:
+        broker.publish(
+            "session", "updated", response.model_dump(mode="json"), id=response.id
+        )
+    return responses
+
+
+@app.get("/api/v1/sessions/next-slot", response_model=NextSlotResponse)
+def next_free_slot(
+    date: str,
+    daypart_name: str,
+    minutes: Optional[int] = Query(default=None, ge=1),
+    after: Optional[TimeOfDay] = None,
+    db: Session = Depends(get_db),
+):
+    settings = get_settings_snapshot(db)
+    daypart = next(
+        (part for part in settings.dayparts if part["name"] == daypart_name), None
+    )
+    if daypart is None:
+        raise HTTPException(status_code=404, detail="Daypart not found")
+    window_start = build_datetime(date, daypart["start"])
+    window_end = build_datetime(date, daypart["end"])
+    if window_end <= window_start:
+        window_end += timedelta(days=1)
+    if after:
+        window_start = max(window_start, build_datetime(date, after))
+    start_at = intervals.get_day_intervals(db, date).next_free_slot(
+        window_start, window_end, minutes or settings.default_focus_minutes
+    )
+    if start_at is None:
+        raise HTTPException(status_code=404, detail="No free slot in this daypart")
+    return NextSlotResponse(
+        date=date,
+        daypart_name=daypart_name,
+        start_at=start_at,
+        planned_time=start_at.strftime("%H:%M"),
+    )
+
+
 @app.post("/api/v1/sessions/{session_id}/start", response_model=SessionResponse)
 def start_planned_session(session_id: int, db: Session = Depends(get_db)):
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session.state != "planned":
-        raise HTTPException(status_code=400, detail="Session is not planned")
-    settings, _ = get_or_create_settings(db)
-    dayparts = json.loads(settings.dayparts_json)
+    settings = get_settings_snapshot(db)
     now = datetime.utcnow()
-    session.start_at = now
-    session.state = "running"
-    session.date = now.date().isoformat()
-    session.daypart_name = resolve_daypart_name(dayparts, now)
-    db.commit()
-    db.refresh(session)
-    return session
+    values = {
+        "start_at": now,
+        "state": "running",
+        "date": now.date().isoformat(),
+        "daypart_name": settings.resolve_daypart_name(now),
+    }
+    session = transition_session(
+        db, session_id, values, SessionModel.state == "planned"
+    )
+    if session is None:
+        raise transition_error(db, session_id, "Session is not planned")
+    return commit_session(db, session)
 
 
 @app.post("/api/v1/sessions/{session_id}/stop", response_model=SessionResponse)
 def stop_session(session_id: int, db: Session = Depends(get_db)):
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session.state != "running":
-        raise HTTPException(status_code=400, detail="Session is not running")
-    session.end_at = datetime.utcnow()
-    session.actual_minutes = compute_actual_minutes(session.start_at, session.end_at)
-    session.state = "completed"
-    db.commit()
-    db.refresh(session)
-    return session
+    now = datetime.utcnow()
+    values = {
+        "end_at": now,
+        "actual_minutes": actual_minutes_sql(now),
+        "state": "completed",
+    }
+    session = transition_session(
+        db, session_id, values, SessionModel.state == "running"
+    )
+    if session is None:
+        raise transition_error(db, session_id, "Session is not running")
+    return commit_session(db, session)
 
 
 @app.post("/api/v1/sessions/{session_id}/skip", response_model=SessionResponse)
 def skip_session(session_id: int, db: Session = Depends(get_db)):
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    session.state = "skipped"
-    session.end_at = datetime.utcnow()
-    session.actual_minutes = 0
-    db.commit()
-    db.refresh(session)
-    return session
+    return commit_session(db, apply_skip_session(db, session_id))
 
 
 @app.post("/api/v1/sessions/{session_id}/adjust", response_model=SessionResponse)
 def adjust_session(
     session_id: int, payload: SessionAdjust, db: Session = Depends(get_db)
 ):
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    session.planned_minutes = max(1, session.planned_minutes + payload.minutes_delta)
-    db.commit()
-    db.refresh(session)
-    return session
+    return commit_session(db, apply_adjust_session(db, session_id, payload))
 
 
 @app.post("/api/v1/sessions/{session_id}/reset")
 def reset_session(session_id: int, db: Session = Depends(get_db)):
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session.state == "planned":
-        db.delete(session)
+    session = apply_reset_session(db, session_id)
+    if session is None:
         db.commit()
+        broker.publish("session", "deleted", id=session_id)
         return {"status": "deleted"}
-    session.state = "aborted"
-    session.end_at = datetime.utcnow()
-    session.actual_minutes = 0
-    db.commit()
+    commit_session(db, session)
     return {"status": "aborted"}
 
 
@@ -373,12 +892,16 @@ def reset_day(
             SessionModel.date == date, SessionModel.state != "planned"
         ).delete()
         db.query(PauseCardUse).filter(PauseCardUse.date == date).delete()
+        pause_usage.clear_day(db, date)
     else:
         db.query(SessionModel).filter(SessionModel.date == date).delete()
         db.query(PauseCardUse).filter(PauseCardUse.date == date).delete()
+        pause_usage.clear_day(db, date)
     state = get_daily_state(db, date)
     state.pause_due_minutes = 0
     db.commit()
+    broker.publish("day", "reset", {"date": date, "mode": mode}, id=date)
+    publish_daily_state(state)
     return {"status": "ok"}
 
 
@@ -389,20 +912,13 @@ def merge_next(session_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Session not found")
     if session.kind != "focus":
         raise HTTPException(status_code=400, detail="Only focus sessions can merge")
-    next_session = (
-        db.query(SessionModel)
-        .filter(
-            SessionModel.date == session.date,
-            SessionModel.state == "planned",
-            SessionModel.kind == "focus",
-            SessionModel.id != session.id,
-        )
-        .order_by(SessionModel.start_at.asc(), SessionModel.id.asc())
-        .first()
+    next_id = intervals.get_day_intervals(db, session.date).first_planned_focus(
+        session.id
     )
+    next_session = db.get(SessionModel, next_id) if next_id else None
     if not next_session:
         raise HTTPException(status_code=404, detail="No next focus session to merge")
-    settings, _ = get_or_create_settings(db)
+    settings = get_settings_snapshot(db)
     state = get_daily_state(db, session.date)
     state.pause_due_minutes += settings.default_break_minutes
     session.planned_minutes += next_session.planned_minutes
@@ -411,53 +927,45 @@ def merge_next(session_id: int, db: Session = Depends(get_db)):
     next_session.actual_minutes = 0
     db.commit()
     db.refresh(session)
+    publish_session(session)
+    publish_session(next_session)
+    publish_daily_state(state)
     return session
 
 
 @app.put("/api/v1/sessions/{session_id}", response_model=SessionResponse)
 def update_session(
-    session_id: int, payload: SessionUpdate, db: Session = Depends(get_db)
+    session_id: int,
+    payload: SessionUpdate,
+    response: Response,
+    overlap: Literal["warn", "reject"] = "warn",
+    db: Session = Depends(get_db),
 ):
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    updates = payload.model_dump(exclude_unset=True)
-    planned_time = updates.pop("planned_time", None)
-    for field, value in updates.items():
-        setattr(session, field, value)
-    if planned_time:
-        session.start_at = build_datetime(session.date, planned_time)
+    session = apply_update_session(db, session_id, payload)
+    check_overlaps(db, session, overlap, response)
     db.commit()
     db.refresh(session)
+    publish_session(session)
     return session
 
 
-@app.get("/api/v1/pause-cards", response_model=List[PauseCardResponse])
-def list_pause_cards(db: Session = Depends(get_db)):
-    today = date_type.today().isoformat()
-    cards = db.query(PauseCard).order_by(PauseCard.created_at.asc()).all()
-    results = []
-    for card in cards:
-        used = (
-            db.query(func.count(PauseCardUse.id))
-            .filter(
-                PauseCardUse.pause_card_id == card.id,
-                PauseCardUse.date == today,
-            )
-            .scalar()
-        )
-        remaining = max(0, card.daily_quota - int(used or 0))
-        results.append(
-            PauseCardResponse(
-                id=card.id,
-                name=card.name,
-                daily_quota=card.daily_quota,
-                is_joker=card.is_joker,
-                created_at=card.created_at,
-                remaining_today=remaining,
-            )
-        )
-    return results
+if ASYNC_DB:
+
+    @app.get("/api/v1/pause-cards", response_model=List[PauseCardResponse])
+    async def list_pause_cards(db: AsyncSession = Depends(get_async_db)):
+        today = date_type.today().isoformat()
+        rows = await db.execute(pause_usage.cards_with_usage_query(today))
+        return [pause_card_to_response(card, used) for card, used in rows]
+
+else:
+
+    @app.get("/api/v1/pause-cards", response_model=List[PauseCardResponse])
+    def list_pause_cards(db: Session = Depends(get_db)):
+        today = date_type.today().isoformat()
+        return [
+            pause_card_to_response(card, used)
+            for card, used in pause_usage.list_cards_with_usage(db, today)
+        ]
 
 
 @app.post("/api/v1/pause-cards", response_model=PauseCardResponse)
@@ -470,14 +978,9 @@ def create_pause_card(payload: PauseCardCreate, db: Session = Depends(get_db)):
     db.add(card)
     db.commit()
     db.refresh(card)
-    return PauseCardResponse(
-        id=card.id,
-        name=card.name,
-        daily_quota=card.daily_quota,
-        is_joker=card.is_joker,
-        created_at=card.created_at,
-        remaining_today=card.daily_quota,
-    )
+    response = pause_card_to_response(card, 0)
+    publish_pause_card(response)
+    return response
 
 
 @app.put("/api/v1/pause-cards/{card_id}", response_model=PauseCardResponse)
@@ -491,50 +994,84 @@ def update_pause_card(
         setattr(card, field, value)
     db.commit()
     db.refresh(card)
-    used = (
-        db.query(func.count(PauseCardUse.id))
-        .filter(
-            PauseCardUse.pause_card_id == card.id,
-            PauseCardUse.date == date_type.today().isoformat(),
-        )
-        .scalar()
-    )
-    remaining = max(0, card.daily_quota - int(used or 0))
-    return PauseCardResponse(
-        id=card.id,
-        name=card.name,
-        daily_quota=card.daily_quota,
-        is_joker=card.is_joker,
-        created_at=card.created_at,
-        remaining_today=remaining,
-    )
+    used = pause_usage.get_used(db, card.id, date_type.today().isoformat())
+    response = pause_card_to_response(card, used)
+    publish_pause_card(response)
+    return response
 
 
 @app.post("/api/v1/pause-cards/reset")
 def reset_pause_cards(date: str = Query(...), db: Session = Depends(get_db)):
     db.query(PauseCardUse).filter(PauseCardUse.date == date).delete()
+    pause_usage.clear_day(db, date)
     db.commit()
+    broker.publish("pause_cards", "reset", {"date": date}, id=date)
     return {"status": "ok"}
 
 
+def get_day_template_or_404(db: Session, template_id: int) -> DayTemplate:
+    template = db.get(DayTemplate, template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Day template not found")
+    return template
+
+
+@app.get("/api/v1/day-templates", response_model=List[DayTemplateResponse])
+def list_day_templates(db: Session = Depends(get_db)):
+    templates = db.scalars(select(DayTemplate).order_by(DayTemplate.name))
+    return [day_templates.template_to_response(template) for template in templates]
+
+
+@app.post("/api/v1/day-templates", response_model=DayTemplateResponse)
+def create_day_template(payload: DayTemplateCreate, db: Session = Depends(get_db)):
+    if db.scalar(select(DayTemplate.id).where(DayTemplate.name == payload.name)):
+        raise HTTPException(status_code=409, detail="Day template name already used")
+    template = DayTemplate(
+        name=payload.name,
+        entries_json=day_templates.entries_to_json(payload.entries),
+    )
+    db.add(template)
+    db.commit()
+    db.refresh(template)
+    return day_templates.template_to_response(template)
+
+
+@app.put("/api/v1/day-templates/{template_id}", response_model=DayTemplateResponse)
+def update_day_template(
+    template_id: int, payload: DayTemplateUpdate, db: Session = Depends(get_db)
+):
+    template = get_day_template_or_404(db, template_id)
+    if payload.name is not None and payload.name != template.name:
+        if db.scalar(select(DayTemplate.id).where(DayTemplate.name == payload.name)):
+            raise HTTPException(
+                status_code=409, detail="Day template name already used"
+            )
+        template.name = payload.name
+    if payload.entries is not None:
+        template.entries_json = day_templates.entries_to_json(payload.entries)
+    db.commit()
+    db.refresh(template)
+    return day_templates.template_to_response(template)
+
+
 @app.post("/api/v1/pause/consume", response_model=SessionResponse)
 def consume_pause_card(payload: PauseConsume, db: Session = Depends(get_db)):
-    card = db.query(PauseCard).filter(PauseCard.id == payload.pause_card_id).first()
+    """Start a break on a pause card's quota, all in one transaction.
+
+    The quota is reserved by the transaction's first write, which takes
+    SQLite's writer lock until the commit: concurrent consumers, in any
+    worker, queue behind it and see the counter it left.
+    """
+    settings = get_settings_snapshot(db)
+    minutes = payload.minutes or settings.default_break_minutes
+    today = date_type.today().isoformat()
+    used = pause_usage.reserve_use(db, payload.pause_card_id, today)
+    card = db.get(PauseCard, payload.pause_card_id)
     if not card:
         raise HTTPException(status_code=404, detail="Pause card not found")
-    today = date_type.today().isoformat()
-    used = (
-        db.query(func.count(PauseCardUse.id))
-        .filter(PauseCardUse.pause_card_id == card.id, PauseCardUse.date == today)
-        .scalar()
-    )
-    remaining = max(0, card.daily_quota - int(used or 0))
-    if remaining <= 0:
+    if used is None:
         raise HTTPException(status_code=400, detail="Pause card quota exhausted")
-    settings, _ = get_or_create_settings(db)
-    minutes = payload.minutes or settings.default_break_minutes
     now = datetime.utcnow()
-    dayparts = json.loads(settings.dayparts_json)
     session = SessionModel(
         kind="break",
         task_id=None,
@@ -543,33 +1080,248 @@ def consume_pause_card(payload: PauseConsume, db: Session = Depends(get_db)):
         state="running",
         note=None,
         date=today,
-        daypart_name=resolve_daypart_name(dayparts, now),
+        daypart_name=settings.resolve_daypart_name(now),
     )
     db.add(session)
+    db.flush()
+    db.add(PauseCardUse(pause_card_id=card.id, date=today, session_id=session.id))
+    due = consume_pause_due(db, today, minutes)
+    card_response = pause_card_to_response(card, used)
+    response = commit_session(db, session)
+    publish_pause_card(card_response)
+    publish_daily_state(DailyState(date=today, pause_due_minutes=due))
+    return response
+
+
+BATCH_APPLIERS = {
+    "create_task": lambda db, op: apply_create_task(db, op.data),
+    "update_task": lambda db, op: apply_update_task(db, op.id, op.data),
+    "complete_task": lambda db, op: apply_complete_task(db, op.id),
+    "plan_session": lambda db, op: apply_plan_session(db, op.data),
+    "update_session": lambda db, op: apply_update_session(db, op.id, op.data),
+    "adjust_session": lambda db, op: apply_adjust_session(db, op.id, op.data),
+    "skip_session": lambda db, op: apply_skip_session(db, op.id),
+    "reset_session": lambda db, op: apply_reset_session(db, op.id),
+}
+
+
+@app.post("/api/v1/batch", response_model=BatchResponse)
+def apply_batch(payload: BatchRequest, db: Session = Depends(get_db)):
+    """Apply an ordered list of operations atomically, with a single commit.
+
+    Any failing operation rolls the whole batch back; the error detail names
+    the index of the operation that failed.
+    """
+    results = []
+    for index, op in enumerate(payload.operations):
+        try:
+            obj = BATCH_APPLIERS[op.op](db, op)
+            db.flush()
+        except HTTPException as exc:
+            db.rollback()
+            raise HTTPException(
+                status_code=exc.status_code,
+                detail={"index": index, "op": op.op, "detail": exc.detail},
+            )
+        results.append((op, obj))
+    # Serialize before committing: the flushed objects are complete, and
+    # reading them after the commit would reload each one with a SELECT.
+    response = BatchResponse(results=[])
+    for op, obj in results:
+        if isinstance(obj, Task):
+            result = BatchResult(
+                op=op.op, id=obj.id, task=TaskResponse.model_validate(obj)
+            )
+        elif obj is None:
+            result = BatchResult(op=op.op, id=op.id, status="deleted")
+        else:
+            result = BatchResult(
+                op=op.op, id=obj.id, session=SessionResponse.model_validate(obj)
+            )
+        response.results.append(result)
     db.commit()
-    db.refresh(session)
-
-    use = PauseCardUse(
-        pause_card_id=card.id,
-        date=today,
-        session_id=session.id,
+    for result in response.results:
+        if result.task is not None:
+            broker.publish(
+                "task", "updated", result.task.model_dump(mode="json"), id=result.id
+            )
+        elif result.session is not None:
+            broker.publish(
+                "session",
+                "updated",
+                result.session.model_dump(mode="json"),
+                id=result.id,
+            )
+        else:
+            broker.publish("session", "deleted", id=result.id)
+    return response
+
+
+@app.get("/api/v1/events")
+async def stream_events(request: Request):
+    """Server-sent events for every committed change, as compact JSON."""
+    queue = broker.subscribe()
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            broker.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    db.add(use)
 
-    state = get_daily_state(db, today)
-    if state.pause_due_minutes > 0:
-        state.pause_due_minutes = max(0, state.pause_due_minutes - minutes)
 
-    db.commit()
-    db.refresh(session)
-    return session
+@app.get("/api/v1/stats", response_model=List[StatsRow])
+def read_stats(
+    from_date: str = Query(..., alias="from"),
+    to_date: str = Query(..., alias="to"),
+    group_by: str = "day",
+    db: Session = Depends(get_db),
+):
+    result = []
+    for row in db.execute(rollups.stats_query(from_date, to_date, group_by)).mappings():
+        values = dict(row)
+        if "task_id" in values:
+            # Rollups store sessions without a task under task_id 0.
+            values["task_id"] = values["task_id"] or None
+        result.append(StatsRow(**values))
+    return result
+
+
+def search_response(response: Response, rows, limit: int) -> list:
+    cursor = search.next_cursor(rows, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+    return search.to_hits(rows)
+
+
+if ASYNC_DB:
+
+    @app.get("/api/v1/search", response_model=List[SearchHit])
+    async def search_notes(
+        response: Response,
+        q: str,
+        from_date: Optional[str] = Query(default=None, alias="from"),
+        to_date: Optional[str] = Query(default=None, alias="to"),
+        after: Optional[str] = Query(default=None),
+        limit: int = Query(default=50, ge=1, le=MAX_PAGE_SIZE),
+        db: AsyncSession = Depends(get_async_db),
+    ):
+        statement, params = search.search_query(q, from_date, to_date, after, limit)
+        rows = (await db.execute(statement, params)).all()
+        return search_response(response, rows, limit)
+
+else:
+
+    @app.get("/api/v1/search", response_model=List[SearchHit])
+    def search_notes(
+        response: Response,
+        q: str,
+        from_date: Optional[str] = Query(default=None, alias="from"),
+        to_date: Optional[str] = Query(default=None, alias="to"),
+        after: Optional[str] = Query(default=None),
+        limit: int = Query(default=50, ge=1, le=MAX_PAGE_SIZE),
+        db: Session = Depends(get_db),
+    ):
+        statement, params = search.search_query(q, from_date, to_date, after, limit)
+        rows = db.execute(statement, params).all()
+        return search_response(response, rows, limit)
+
+
+@app.post("/api/v1/import", response_model=ImportResponse)
+async def bulk_import(request: Request, db: Session = Depends(get_db)):
+    snapshot = await run_in_threadpool(get_settings_snapshot, db)
+    importer = BulkImporter(snapshot)
+    tail = b""
+    async for chunk in request.stream():
+        *lines, tail = (tail + chunk).split(b"\n")
+        if lines:
+            await run_in_threadpool(importer.feed_lines, lines)
+    if tail:
+        await run_in_threadpool(importer.feed_lines, [tail])
+    result = await run_in_threadpool(importer.finish)
+    broker.publish("resync", "resync")
+    return result
 
 
 @app.get("/api/v1/export/sqlite")
-def export_sqlite():
-    db_path = "/data/app.db"
-    if not os.path.exists(db_path):
+def export_sqlite(compression: str = "none"):
+    backup.check_compression(compression)
+    path = current_database().path
+    if not path or not os.path.exists(path):
         raise HTTPException(status_code=404, detail="Database not found")
-    return FileResponse(
-        db_path, media_type="application/octet-stream", filename="tomate.db"
+    slot = backup.ExportSlot()
+    try:
+        slot.path = backup.snapshot_database()
+    except BaseException:
+        slot.release()
+        raise
+    media_type, suffix = backup.COMPRESSIONS[compression]
+    return slot.bind(
+        StreamingResponse(
+            backup.stream_snapshot(slot, compression),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="tomate.db{suffix}"'},
+        )
+    )
+
+
+if ASYNC_DB:
+
+    @app.get("/api/v1/changes", response_model=ChangesResponse)
+    async def read_changes(
+        since: int = Query(default=0, ge=0),
+        limit: int = Query(default=MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        db: AsyncSession = Depends(get_async_db),
+    ):
+        payload = await db.run_sync(changes.changes_since, since, limit)
+        return serialization.json_response(orjson.dumps(payload))
+
+else:
+
+    @app.get("/api/v1/changes", response_model=ChangesResponse)
+    def read_changes(
+        since: int = Query(default=0, ge=0),
+        limit: int = Query(default=MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        db: Session = Depends(get_db),
+    ):
+        payload = changes.changes_since(db, since, limit)
+        return serialization.json_response(orjson.dumps(payload))
+
+
+@app.get("/api/v1/export/changes")
+def export_changes(since: Optional[datetime] = None, compression: str = "none"):
+    backup.check_compression(compression)
+    slot = backup.ExportSlot()
+    media_type, suffix = backup.COMPRESSIONS[compression]
+    if compression == "none":
+        media_type = "application/x-ndjson"
+    return slot.bind(
+        StreamingResponse(
+            backup.stream_changes(slot, since, compression),
+            media_type=media_type,
+            headers={
+                "Content-Disposition": f'attachment; filename="tomate-changes.ndjson{suffix}"'
+            },
+        )
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(
+        metrics.registry.render(), media_type="text/plain; version=0.0.4"
     )
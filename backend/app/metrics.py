@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import event
+
+# Adds X-DB-Queries / X-DB-Time-Ms to every response when enabled.
+QUERY_STATS_HEADER = os.getenv("TOMATE_QUERY_STATS_HEADER", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+
+
+# Bound per request by the middleware. The object is mutated rather than
+# replaced, so the threadpool copies of the context update the same one.
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def _handle_error(context):
+    # after_cursor_execute does not run for failed statements.
+    if context.connection is not None:
+        started = context.connection.info.get("query_started")
+        if started:
+            started.pop()
+
+
+def instrument_engine(engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+@dataclass
+class Histogram:
+    buckets: tuple
+    counts: list = field(default_factory=list)
+    total: float = 0.0
+    count: int = 0
+
+    def __post_init__(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """In-process metrics; each worker reports its own."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = {}
+        self.query_counts = {}
+        self.db_seconds = {}
+        self.responses = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats):
+        key = (method, route)
+        with self.lock:
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.query_counts[key] = Histogram(QUERY_COUNT_BUCKETS)
+                self.db_seconds[key] = 0.0
+            self.latency[key].observe(seconds)
+            self.query_counts[key].observe(stats.queries)
+            self.db_seconds[key] += stats.db_seconds
+            status_key = (method, route, str(status))
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def render(self) -> str:
+        """Prometheus text exposition format, version 0.0.4."""
+        lines = []
+        with self.lock:
+            _render_histogram(
+                lines,
+                "tomate_http_request_duration_seconds",
+                "Request latency by route.",
+                self.latency,
+            )
+            _render_histogram(
+                lines,
+                "tomate_db_queries_per_request",
+                "SQL statements executed per request, by route.",
+                self.query_counts,
+            )
+            lines.append(
+                "# HELP tomate_db_seconds_total Time spent in SQL statements, by route."
+            )
+            lines.append("# TYPE tomate_db_seconds_total counter")
+            for (method, route), seconds in sorted(self.db_seconds.items()):
+                lines.append(
+                    f"tomate_db_seconds_total{_labels(method=method, route=route)} "
+                    f"{seconds}"
+                )
+            lines.append("# HELP tomate_http_responses_total Responses by route and status.")
+            lines.append("# TYPE tomate_http_responses_total counter")
+            for (method, route, status), count in sorted(self.responses.items()):
+                labels = _labels(method=method, route=route, status=status)
+                lines.append(f"tomate_http_responses_total{labels} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _labels(**values) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in values.items()) + "}"
+
+
+def _render_histogram(lines, name, help_text, histograms) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            labels = _labels(method=method, route=route, le=str(bound))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _labels(method=method, route=route, le="+Inf")
+        lines.append(f"{name}_bucket{labels} {histogram.count}")
+        labels = _labels(method=method, route=route)
+        lines.append(f"{name}_sum{labels} {histogram.total}")
+        lines.append(f"{name}_count{labels} {histogram.count}")
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency and SQL work per request.
+
+    Requests are labelled with the route template (``/api/v1/tasks/{task_id}``)
+    so ids do not blow up the label cardinality.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if QUERY_STATS_HEADER:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-queries", str(stats.queries).encode()))
+                    headers.append(
+                        (b"x-db-time-ms", f"{stats.db_seconds * 1000:.2f}".encode())
+                    )
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            registry.observe(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+                time.perf_counter() - started,
+                stats,
+            )
@@ -0,0 +1,204 @@
+"""Numbered schema migrations tracked in ``PRAGMA user_version``.
+
+Migration N is ``MIGRATIONS[N - 1]``. Append new steps; never reorder or
+edit released ones. Step 1 creates any missing table from the current
+models, so later steps must also work on a database that already has
+their change (see ``add_column``).
+"""
+
+from sqlalchemy.schema import CreateTable
+
+from . import archive, changes, etags, pause_usage, rollups, search
+from .db import SQLITE_PRAGMAS, Base
+from .models import PauseCardUse, RowVersion, Session, SessionArchive
+
+# How long a worker waits for another one to finish migrating.
+LOCK_TIMEOUT_MS = 10 * 60 * 1000
+
+
+def add_column(conn, table: str, column: str, ddl: str) -> bool:
+    columns = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+    if column in columns:
+        return False
+    conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+    return True
+
+
+def table_sql(conn, name: str) -> str:
+    return conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).scalar()
+
+
+def rebuild_table(conn, table) -> None:
+    """Recreate ``table`` from its model, keeping its rows.
+
+    Dropping the table drops its indexes and triggers: the caller must
+    install them again. Foreign keys are off, so nothing cascades.
+    """
+    wanted = str(CreateTable(table).compile(dialect=conn.dialect)).strip()
+    columns = ", ".join(column.name for column in table.c)
+    conn.exec_driver_sql(
+        wanted.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {table.name}_new ", 1)
+    )
+    conn.exec_driver_sql(
+        f"INSERT INTO {table.name}_new ({columns}) SELECT {columns} FROM {table.name}"
+    )
+    conn.exec_driver_sql(f"DROP TABLE {table.name}")
+    # Legacy mode: the rename must not check the triggers of other tables,
+    # which may reference the table while it is gone.
+    conn.exec_driver_sql("PRAGMA legacy_alter_table = ON")
+    try:
+        conn.exec_driver_sql(f"ALTER TABLE {table.name}_new RENAME TO {table.name}")
+    finally:
+        conn.exec_driver_sql("PRAGMA legacy_alter_table = OFF")
+
+
+def create_tables(conn) -> None:
+    Base.metadata.create_all(bind=conn)
+
+
+def add_session_title(conn) -> None:
+    add_column(conn, "sessions", "title", "VARCHAR")
+
+
+def add_settings_version(conn) -> None:
+    add_column(conn, "settings", "version", "INTEGER NOT NULL DEFAULT 1")
+
+
+def add_updated_at(conn) -> None:
+    if add_column(conn, "sessions", "updated_at", "DATETIME"):
+        conn.exec_driver_sql("UPDATE sessions SET updated_at = COALESCE(end_at, start_at)")
+    if add_column(conn, "pause_cards", "updated_at", "DATETIME"):
+        conn.exec_driver_sql("UPDATE pause_cards SET updated_at = created_at")
+
+
+def create_indexes(conn) -> None:
+    # create_all skips tables that already exist, including their indexes.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+def backfill_pause_usage(conn) -> None:
+    pause_usage.rebuild_usage(conn)
+
+
+def install_change_markers(conn) -> None:
+    etags.install_change_markers(conn)
+
+
+def install_rollups(conn) -> None:
+    rollups.install_rollup_triggers(conn)
+    rollups.rebuild_rollups(conn)
+
+
+def scope_rollup_pruning(conn) -> None:
+    # The first triggers pruned with a scan of every rollup row.
+    rollups.install_rollup_triggers(conn, replace=True)
+
+
+def create_session_archives(conn) -> None:
+    SessionArchive.__table__.create(bind=conn, checkfirst=True)
+
+
+def create_search_index(conn) -> None:
+    search.install_search_index(conn)
+    search.rebuild_search_index(conn)
+
+
+def create_change_log(conn) -> None:
+    RowVersion.__table__.create(bind=conn, checkfirst=True)
+    changes.install_change_log(conn)
+    changes.backfill_change_log(conn)
+
+
+def count_change_versions(conn) -> None:
+    # The first triggers took MAX(version) + 1, which archiving can lower.
+    changes.install_change_log(conn, replace=True)
+
+
+def autoincrement_ids(conn) -> None:
+    # SQLite hands out max(rowid) + 1, which reuses the ids of archived
+    # and deleted rows; AUTOINCREMENT stays above every id ever used.
+    tables = [Session.__table__, PauseCardUse.__table__]
+    rebuilt = [t for t in tables if "AUTOINCREMENT" not in table_sql(conn, t.name)]
+    for table in rebuilt:
+        rebuild_table(conn, table)
+    if rebuilt:
+        create_indexes(conn)
+        etags.install_change_markers(conn)
+        rollups.install_rollup_triggers(conn)
+        search.install_search_index(conn)
+        changes.install_change_log(conn)
+    # Ids used before the rebuild: archived rows and deletion tombstones.
+    for table, used in archive.archived_max_ids(conn).items():
+        conn.exec_driver_sql(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT ?, 0 "
+            "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)",
+            (table, table),
+        )
+        conn.exec_driver_sql(
+            "UPDATE sqlite_sequence SET seq = max(seq, ?, "
+            "(SELECT COALESCE(MAX(CAST(row_key AS INTEGER)), 0) FROM row_versions "
+            "WHERE table_name = ?)) WHERE name = ?",
+            (used, table, table),
+        )
+
+
+def index_change_timestamps(conn) -> None:
+    # The incremental export scanned tasks and pause card uses.
+    create_indexes(conn)
+
+
+MIGRATIONS = [
+    create_tables,
+    add_session_title,
+    add_settings_version,
+    add_updated_at,
+    create_indexes,
+    backfill_pause_usage,
+    install_change_markers,
+    install_rollups,
+    scope_rollup_pruning,
+    create_session_archives,
+    create_search_index,
+    create_change_log,
+    count_change_versions,
+    autoincrement_ids,
+    index_change_timestamps,
+]
+LATEST = len(MIGRATIONS)
+
+
+def schema_version(conn) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(engine) -> int:
+    """Bring the database to LATEST; a no-op read when it already is.
+
+    Pending steps run in a single BEGIN EXCLUSIVE transaction, so workers
+    starting together wait for the first one and then find nothing to do.
+    """
+    with engine.connect() as conn:
+        if schema_version(conn) >= LATEST:
+            return LATEST
+    with engine.connect() as conn:
+        # Manual transaction control: the driver must not issue its own BEGIN.
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.exec_driver_sql(f"PRAGMA busy_timeout = {LOCK_TIMEOUT_MS}")
+        try:
+            conn.exec_driver_sql("BEGIN EXCLUSIVE")
+            try:
+                current = schema_version(conn)
+                for step in MIGRATIONS[current:]:
+                    step(conn)
+                conn.exec_driver_sql(f"PRAGMA user_version = {max(current, LATEST)}")
+                conn.exec_driver_sql("COMMIT")
+            except BaseException:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+        finally:
+            conn.exec_driver_sql(f"PRAGMA busy_timeout = {SQLITE_PRAGMAS['busy_timeout']}")
+    return LATEST
@@ -4,6 +4,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
@@ -22,6 +23,7 @@ class Settings(Base):
     default_break_minutes = Column(Integer, nullable=False, default=5)
     notifications_enabled = Column(Boolean, nullable=False, default=True)
     sound_enabled = Column(Boolean, nullable=False, default=True)
+    version = Column(Integer, nullable=False, default=1)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -45,6 +47,13 @@ class Task(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     sessions = relationship("Session", back_populates="task")
 
+    __table_args__ = (
+        # list_tasks: newest first, resumed by keyset on (created_at, id).
+        Index("ix_tasks_created_at", "created_at"),
+        # Incremental export: rows changed since a timestamp.
+        Index("ix_tasks_updated_at", "updated_at"),
+    )
+
 
 class Session(Base):
     __tablename__ = "sessions"
@@ -61,9 +70,22 @@ class Session(Base):
     note = Column(Text, nullable=True)
     date = Column(String, nullable=False)
     daypart_name = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     task = relationship("Task", back_populates="sessions")
 
+    __table_args__ = (
+        # list_sessions: range on date, ordered by start_at.
+        Index("ix_sessions_date_start_at", "date", "start_at"),
+        # merge_next / reset_day: equality on (date, state, kind), ordered by
+        # start_at then id (the rowid is implicitly part of every index).
+        Index("ix_sessions_date_state_kind_start_at", "date", "state", "kind", "start_at"),
+        # Incremental export: rows changed since a timestamp.
+        Index("ix_sessions_updated_at", "updated_at"),
+        # Ids are never reused, so archived sessions keep theirs for good.
+        {"sqlite_autoincrement": True},
+    )
+
 
 class PauseCard(Base):
     __tablename__ = "pause_cards"
@@ -73,6 +95,7 @@ class PauseCard(Base):
     daily_quota = Column(Integer, nullable=False, default=1)
     is_joker = Column(Boolean, nullable=False, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     uses = relationship("PauseCardUse", back_populates="card")
 
 
@@ -86,3 +109,87 @@ class PauseCardUse(Base):
     used_at = Column(DateTime, default=datetime.utcnow)
 
     card = relationship("PauseCard", back_populates="uses")
+
+    __table_args__ = (
+        # Quota counts filter on (pause_card_id, date); resets delete by date.
+        Index("ix_pause_card_uses_date_card", "date", "pause_card_id"),
+        # Incremental export: uses recorded since a timestamp.
+        Index("ix_pause_card_uses_used_at", "used_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+class PauseCardUsage(Base):
+    """Per-day use counter for a pause card, derived from pause_card_uses."""
+
+    __tablename__ = "pause_card_usage"
+
+    date = Column(String, primary_key=True)
+    pause_card_id = Column(Integer, ForeignKey("pause_cards.id"), primary_key=True)
+    used = Column(Integer, nullable=False, default=0)
+
+
+class ChangeMarker(Base):
+    """Per-table counter bumped by triggers on every write (see etags.py)."""
+
+    __tablename__ = "change_markers"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class RowVersion(Base):
+    """Last change of every synced row, deletions included (see changes.py)."""
+
+    __tablename__ = "row_versions"
+
+    table_name = Column(String, primary_key=True)
+    # The row's primary key as text: daily_state is keyed by date.
+    row_key = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        # /changes: rows changed after a version.
+        Index("ix_row_versions_version", "version", unique=True),
+    )
+
+
+class DayTemplate(Base):
+    __tablename__ = "day_templates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False, unique=True)
+    entries_json = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DailyRollup(Base):
+    """Totals of finished sessions, kept current by triggers (see rollups.py).
+
+    task_id is 0 for sessions without a task so it can be part of the key.
+    """
+
+    __tablename__ = "daily_rollups"
+
+    date = Column(String, primary_key=True)
+    daypart_name = Column(String, primary_key=True)
+    task_id = Column(Integer, primary_key=True)
+    kind = Column(String, primary_key=True)
+    session_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    planned_minutes = Column(Integer, nullable=False, default=0)
+    actual_minutes = Column(Integer, nullable=False, default=0)
+
+
+class SessionArchive(Base):
+    """A yearly archive file of finished sessions (see archive.py)."""
+
+    __tablename__ = "session_archives"
+
+    year = Column(Integer, primary_key=True)
+    # Latest session date moved into the file.
+    through_date = Column(String, nullable=False)
+    session_count = Column(Integer, nullable=False, default=0)
+    archived_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,65 @@
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+MAX_PAGE_SIZE = 1000
+
+
+def _encode(*parts) -> str:
+    raw = "|".join(map(str, parts)).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(token: str) -> list[str]:
+    padded = token + "=" * (-len(token) % 4)
+    return base64.urlsafe_b64decode(padded).decode().split("|")
+
+
+def encode_cursor(at: datetime, row_id: int) -> str:
+    return _encode(at.isoformat(), row_id)
+
+
+def decode_cursor(token: str) -> tuple[datetime, int]:
+    try:
+        at, row_id = _decode(token)
+        return datetime.fromisoformat(at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_score_cursor(score: float, row_id: int) -> str:
+    # repr() round-trips the float exactly, so the page resumes on ties.
+    return _encode(repr(score), row_id)
+
+
+def decode_score_cursor(token: str) -> tuple[float, int]:
+    try:
+        score, row_id = _decode(token)
+        return float(score), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset(query, order_column, id_column, after, limit, descending=False):
+    """Order by (order_column, id) and resume strictly after the cursor."""
+    key = tuple_(order_column, id_column)
+    if after:
+        position = tuple_(*decode_cursor(after))
+        query = query.where(key < position if descending else key > position)
+    if descending:
+        query = query.order_by(order_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(order_column.asc(), id_column.asc())
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+def next_cursor(rows, order_attr: str, limit):
+    """Cursor for the following page, or None when this page is the last."""
+    if not limit or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(getattr(last, order_attr), last.id)
@@ -0,0 +1,80 @@
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .models import PauseCard, PauseCardUsage, PauseCardUse
+
+
+def cards_with_usage_query(date_value: str):
+    """Select (card, used) pairs for every card in a single query."""
+    return (
+        select(PauseCard, func.coalesce(PauseCardUsage.used, 0))
+        .outerjoin(
+            PauseCardUsage,
+            (PauseCardUsage.pause_card_id == PauseCard.id)
+            & (PauseCardUsage.date == date_value),
+        )
+        .order_by(PauseCard.created_at.asc())
+    )
+
+
+def list_cards_with_usage(db: Session, date_value: str):
+    return db.execute(cards_with_usage_query(date_value)).all()
+
+
+def get_used(db: Session, card_id: int, date_value: str) -> int:
+    used = db.execute(
+        select(PauseCardUsage.used).where(
+            PauseCardUsage.date == date_value,
+            PauseCardUsage.pause_card_id == card_id,
+        )
+    ).scalar()
+    return int(used or 0)
+
+
+def reserve_use(db: Session, card_id: int, date_value: str) -> Optional[int]:
+    """Count one use of the card, if its quota allows; return the new count.
+
+    A single upsert whose update is guarded on the live quota, so SQLite's
+    writer lock serializes concurrent consumers: of two racing for the
+    last use, the second finds the counter full. None means no use was
+    counted (quota exhausted, or no such card).
+    """
+    quota = (
+        select(PauseCard.daily_quota)
+        .where(PauseCard.id == card_id)
+        .scalar_subquery()
+    )
+    stmt = sqlite_insert(PauseCardUsage).from_select(
+        ["date", "pause_card_id", "used"],
+        select(literal(date_value), PauseCard.id, literal(1)).where(
+            PauseCard.id == card_id, PauseCard.daily_quota >= 1
+        ),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PauseCardUsage.date, PauseCardUsage.pause_card_id],
+        set_={"used": PauseCardUsage.used + 1},
+        where=PauseCardUsage.used < quota,
+    ).returning(PauseCardUsage.used)
+    return db.execute(stmt).scalar()
+
+
+def clear_day(db: Session, date_value: str) -> None:
+    db.execute(delete(PauseCardUsage).where(PauseCardUsage.date == date_value))
+
+
+def rebuild_usage(conn) -> None:
+    """Recompute every counter from the pause_card_uses rows."""
+    conn.execute(delete(PauseCardUsage))
+    conn.execute(
+        insert(PauseCardUsage).from_select(
+            ["date", "pause_card_id", "used"],
+            select(
+                PauseCardUse.date,
+                PauseCardUse.pause_card_id,
+                func.count(PauseCardUse.id),
+            ).group_by(PauseCardUse.date, PauseCardUse.pause_card_id),
+        )
+    )
@@ -0,0 +1,136 @@
+from fastapi import HTTPException
+from sqlalchemy import Integer, cast, func, select
+
+from .models import DailyRollup
+
+# A session is counted once it reaches one of these states.
+FINISHED_STATES = ("completed", "skipped", "aborted")
+
+_FINISHED = ", ".join(f"'{state}'" for state in FINISHED_STATES)
+_COLUMNS = (
+    "date, daypart_name, task_id, kind, "
+    "session_count, completed_count, planned_minutes, actual_minutes"
+)
+_KEY = "date, daypart_name, task_id, kind"
+
+
+def _apply(row: str, sign: str) -> str:
+    """Upsert ROW's contribution (sign '+' or '-') when it is finished."""
+    return (
+        f"INSERT INTO daily_rollups ({_COLUMNS}) "
+        f"SELECT {row}.date, {row}.daypart_name, COALESCE({row}.task_id, 0), "
+        f"{row}.kind, {sign}1, {sign}({row}.state = 'completed'), "
+        f"{sign}{row}.planned_minutes, {sign}COALESCE({row}.actual_minutes, 0) "
+        f"WHERE {row}.state IN ({_FINISHED}) "
+        f"ON CONFLICT ({_KEY}) DO UPDATE SET "
+        "session_count = session_count + excluded.session_count, "
+        "completed_count = completed_count + excluded.completed_count, "
+        "planned_minutes = planned_minutes + excluded.planned_minutes, "
+        "actual_minutes = actual_minutes + excluded.actual_minutes;"
+    )
+
+
+def _prune(row: str) -> str:
+    """Drop ROW's rollup once nothing counts towards it (a primary key lookup)."""
+    return (
+        f"DELETE FROM daily_rollups WHERE date = {row}.date "
+        f"AND daypart_name = {row}.daypart_name "
+        f"AND task_id = COALESCE({row}.task_id, 0) AND kind = {row}.kind "
+        "AND session_count = 0;"
+    )
+
+
+TRIGGERS = {
+    "trg_sessions_rollup_insert": (
+        f"AFTER INSERT ON sessions BEGIN {_apply('NEW', '+')} END"
+    ),
+    "trg_sessions_rollup_delete": (
+        f"AFTER DELETE ON sessions BEGIN {_apply('OLD', '-')} {_prune('OLD')} END"
+    ),
+    "trg_sessions_rollup_update": (
+        "AFTER UPDATE OF state, date, daypart_name, task_id, kind, "
+        "planned_minutes, actual_minutes ON sessions BEGIN "
+        f"{_apply('OLD', '-')} {_apply('NEW', '+')} {_prune('OLD')} END"
+    ),
+}
+
+
+def install_rollup_triggers(conn, replace: bool = False) -> None:
+    for name, body in TRIGGERS.items():
+        if replace:
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def rebuild_rollups(conn, archives=()) -> None:
+    """Recompute every rollup row from the sessions table.
+
+    ``archives`` names attached archive schemas whose sessions count too.
+    """
+    source = " UNION ALL ".join(
+        "SELECT date, daypart_name, task_id, kind, state, planned_minutes, "
+        f"actual_minutes FROM {schema}.sessions"
+        for schema in ("main", *archives)
+    )
+    conn.exec_driver_sql("DELETE FROM main.daily_rollups")
+    conn.exec_driver_sql(
+        f"INSERT INTO main.daily_rollups ({_COLUMNS}) "
+        "SELECT date, daypart_name, COALESCE(task_id, 0), kind, COUNT(*), "
+        "SUM(state = 'completed'), SUM(planned_minutes), "
+        "SUM(COALESCE(actual_minutes, 0)) "
+        f"FROM ({source}) WHERE state IN ({_FINISHED}) "
+        f"GROUP BY {_KEY}"
+    )
+
+
+# ISO 8601 week ("2027-W01"): a week belongs to the year of its Thursday
+# and is numbered from that year's first Thursday. SQLite only has %G and
+# %V from 3.46, so both are read off the Thursday.
+_THURSDAY = func.date(DailyRollup.date, "-3 days", "weekday 4")
+ISO_WEEK = func.printf(
+    "%s-W%02d",
+    func.strftime("%Y", _THURSDAY),
+    (cast(func.strftime("%j", _THURSDAY), Integer) - 1) // 7 + 1,
+)
+
+GROUPINGS = {
+    "day": DailyRollup.date,
+    "week": ISO_WEEK,
+    "month": func.substr(DailyRollup.date, 1, 7),
+    "year": func.substr(DailyRollup.date, 1, 4),
+    "daypart": DailyRollup.daypart_name,
+    "task": DailyRollup.task_id,
+    "kind": DailyRollup.kind,
+}
+LABELS = {"daypart": "daypart_name", "task": "task_id", "kind": "kind"}
+
+
+def stats_query(from_date: str, to_date: str, group_by: str):
+    """Aggregate the rollups in [from_date, to_date] by the given keys.
+
+    group_by is a comma-separated list of GROUPINGS keys; at most one of the
+    time keys (day, week, month, year) fills the ``period`` column.
+    """
+    keys = [key.strip() for key in group_by.split(",") if key.strip()]
+    unknown = [key for key in keys if key not in GROUPINGS]
+    if unknown or len(set(keys)) != len(keys):
+        raise HTTPException(status_code=400, detail="Invalid group_by")
+    periods = [key for key in keys if key not in LABELS]
+    if len(periods) > 1:
+        raise HTTPException(
+            status_code=400, detail="Only one of day, week, month, year"
+        )
+    columns = []
+    for key in keys:
+        columns.append(GROUPINGS[key].label(LABELS.get(key, "period")))
+    group_columns = [GROUPINGS[key] for key in keys]
+    query = select(
+        *columns,
+        func.coalesce(func.sum(DailyRollup.session_count), 0).label("session_count"),
+        func.coalesce(func.sum(DailyRollup.completed_count), 0).label("completed_count"),
+        func.coalesce(func.sum(DailyRollup.planned_minutes), 0).label("planned_minutes"),
+        func.coalesce(func.sum(DailyRollup.actual_minutes), 0).label("actual_minutes"),
+    ).where(DailyRollup.date >= from_date, DailyRollup.date <= to_date)
+    if group_columns:
+        query = query.group_by(*group_columns).order_by(*group_columns)
+    return query
@@ -1,16 +1,21 @@
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import Annotated, Any, Dict, List, Literal, Optional, Union
+from pydantic import BaseModel, ConfigDict, Field
+
+
+# "HH:MM", as utils.parse_time reads it.
+TimeOfDay = Annotated[str, Field(pattern=r"^([01]\d|2[0-3]):[0-5]\d$")]
 
 
 class Daypart(BaseModel):
     name: str
-    start: str
-    end: str
+    start: TimeOfDay
+    end: TimeOfDay
 
 
 class SettingsBase(BaseModel):
-    dayparts: List[Daypart]
+    # Planning resolves every session to a daypart, the first one by default.
+    dayparts: List[Daypart] = Field(min_length=1)
     default_focus_minutes: int = Field(ge=1)
     default_break_minutes: int = Field(ge=1)
     notifications_enabled: bool
@@ -43,6 +48,8 @@ class TaskUpdate(BaseModel):
 
 
 class TaskResponse(TaskBase):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     status: str
     created_at: datetime
@@ -60,6 +67,8 @@ class SessionBase(BaseModel):
 
 
 class SessionResponse(SessionBase):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     start_at: datetime
     end_at: Optional[datetime] = None
@@ -84,6 +93,51 @@ class SessionPlan(BaseModel):
     planned_time: str
 
 
+class DayTemplateEntry(BaseModel):
+    daypart_name: str
+    planned_time: TimeOfDay
+    minutes: Optional[int] = Field(default=None, ge=1)
+    task_id: Optional[int] = None
+    title: Optional[str] = None
+
+
+class DayTemplateBase(BaseModel):
+    name: str
+    entries: List[DayTemplateEntry] = Field(min_length=1)
+
+
+class DayTemplateCreate(DayTemplateBase):
+    pass
+
+
+class DayTemplateUpdate(BaseModel):
+    name: Optional[str] = None
+    entries: Optional[List[DayTemplateEntry]] = Field(default=None, min_length=1)
+
+
+class DayTemplateResponse(DayTemplateBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+
+class NextSlotResponse(BaseModel):
+    date: str
+    daypart_name: str
+    start_at: datetime
+    planned_time: str
+
+
+class SearchHit(BaseModel):
+    kind: Literal["task", "session"]
+    id: int
+    date: str
+    # HTML-escaped, matched words wrapped in <mark>.
+    title: Optional[str] = None
+    note: Optional[str] = None
+    score: float
+
+
 class SessionStop(BaseModel):
     pass
 
@@ -136,3 +190,153 @@ class PauseConsume(BaseModel):
 class DailyStateResponse(BaseModel):
     date: str
     pause_due_minutes: int
+
+
+class BootstrapResponse(BaseModel):
+    settings: SettingsResponse
+    tasks: List[TaskResponse]
+    pause_cards: List[PauseCardResponse]
+    sessions: List[SessionResponse]
+    daily_state: DailyStateResponse
+
+
+class StatsRow(BaseModel):
+    period: Optional[str] = None
+    daypart_name: Optional[str] = None
+    task_id: Optional[int] = None
+    kind: Optional[str] = None
+    session_count: int
+    completed_count: int
+    planned_minutes: int
+    actual_minutes: int
+
+
+class CreateTaskOp(BaseModel):
+    op: Literal["create_task"]
+    data: TaskCreate
+
+
+class UpdateTaskOp(BaseModel):
+    op: Literal["update_task"]
+    id: int
+    data: TaskUpdate
+
+
+class CompleteTaskOp(BaseModel):
+    op: Literal["complete_task"]
+    id: int
+
+
+class PlanSessionOp(BaseModel):
+    op: Literal["plan_session"]
+    data: SessionPlan
+
+
+class UpdateSessionOp(BaseModel):
+    op: Literal["update_session"]
+    id: int
+    data: SessionUpdate
+
+
+class AdjustSessionOp(BaseModel):
+    op: Literal["adjust_session"]
+    id: int
+    data: SessionAdjust
+
+
+class SkipSessionOp(BaseModel):
+    op: Literal["skip_session"]
+    id: int
+
+
+class ResetSessionOp(BaseModel):
+    op: Literal["reset_session"]
+    id: int
+
+
+BatchOperation = Annotated[
+    Union[
+        CreateTaskOp,
+        UpdateTaskOp,
+        CompleteTaskOp,
+        PlanSessionOp,
+        UpdateSessionOp,
+        AdjustSessionOp,
+        SkipSessionOp,
+        ResetSessionOp,
+    ],
+    Field(discriminator="op"),
+]
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(min_length=1, max_length=500)
+
+
+class BatchResult(BaseModel):
+    op: str
+    id: Optional[int] = None
+    status: str = "ok"
+    task: Optional[TaskResponse] = None
+    session: Optional[SessionResponse] = None
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchResult]
+
+
+class TaskImport(TaskBase):
+    id: Optional[int] = None
+    status: str = "active"
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class PauseCardImport(PauseCardBase):
+    id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class SessionImport(BaseModel):
+    id: Optional[int] = None
+    kind: str
+    task_id: Optional[int] = None
+    start_at: datetime
+    end_at: Optional[datetime] = None
+    planned_minutes: int = Field(ge=1)
+    actual_minutes: Optional[int] = None
+    state: str = "completed"
+    title: Optional[str] = None
+    note: Optional[str] = None
+    date: Optional[str] = None
+    daypart_name: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+
+class PauseCardUseImport(BaseModel):
+    id: Optional[int] = None
+    pause_card_id: int
+    session_id: int
+    date: Optional[str] = None
+    used_at: datetime
+
+
+class ChangesResponse(BaseModel):
+    version: int
+    has_more: bool
+    # Table name -> changed rows, every column as stored.
+    changed: Dict[str, List[Dict[str, Any]]]
+    # Table name -> primary keys of deleted rows.
+    deleted: Dict[str, List[Union[int, str]]]
+
+
+class ImportLineError(BaseModel):
+    line: int
+    detail: str
+
+
+class ImportResponse(BaseModel):
+    inserted: Dict[str, int]
+    error_count: int
+    errors: List[ImportLineError]
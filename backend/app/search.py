@@ -0,0 +1,156 @@
+"""Full-text search over task and session titles and notes.
+
+``search_index`` is an FTS5 table kept in sync by triggers, so writes made
+by bulk statements, imports or other processes are indexed too. Sessions
+are stored under their id as rowid and tasks under the negated id, which
+lets the triggers touch a single row by rowid. Sessions with neither a
+title nor a note are left out. Archived sessions leave the index with
+their rows.
+"""
+
+import html
+import re
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from .pagination import decode_score_cursor, encode_score_cursor
+
+# bm25() weights of the title and note columns.
+TITLE_WEIGHT = 10.0
+NOTE_WEIGHT = 1.0
+# Tokens around the best match in a note's snippet.
+SNIPPET_TOKENS = 16
+
+# highlight() can't escape the text around its markers, so it emits
+# control characters that are swapped for <mark> once the text is escaped.
+_OPEN, _CLOSE = "\x02", "\x03"
+_WORD = re.compile(r"\w+")
+
+# Per source table: rowid and date expressions of a row.
+SOURCES = {
+    "tasks": ("-{row}.id", "date({row}.created_at)", "created_at"),
+    "sessions": ("{row}.id", "{row}.date", "date"),
+}
+
+
+def _index(table: str, row: str) -> str:
+    rowid, day, _ = SOURCES[table]
+    return (
+        "INSERT INTO search_index (rowid, title, note, date) "
+        f"SELECT {rowid.format(row=row)}, {row}.title, {row}.note, "
+        f"{day.format(row=row)} "
+        f"WHERE {row}.title IS NOT NULL OR {row}.note IS NOT NULL;"
+    )
+
+
+def _unindex(table: str, row: str) -> str:
+    rowid = SOURCES[table][0].format(row=row)
+    return f"DELETE FROM search_index WHERE rowid = {rowid};"
+
+
+def triggers() -> dict:
+    result = {}
+    for table, (_, _, date_column) in SOURCES.items():
+        result[f"trg_{table}_search_insert"] = (
+            f"AFTER INSERT ON {table} BEGIN {_index(table, 'NEW')} END"
+        )
+        result[f"trg_{table}_search_delete"] = (
+            f"AFTER DELETE ON {table} BEGIN {_unindex(table, 'OLD')} END"
+        )
+        result[f"trg_{table}_search_update"] = (
+            f"AFTER UPDATE OF title, note, {date_column} ON {table} BEGIN "
+            f"{_unindex(table, 'OLD')} {_index(table, 'NEW')} END"
+        )
+    return result
+
+
+def install_search_index(conn) -> None:
+    # remove_diacritics 2: "reunion" finds "réunion".
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "title, note, date UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    for name, body in triggers().items():
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def rebuild_search_index(conn) -> None:
+    """Reindex every task and session, then merge the index b-trees."""
+    conn.exec_driver_sql("DELETE FROM search_index")
+    for table, (rowid, day, _) in SOURCES.items():
+        conn.exec_driver_sql(
+            "INSERT INTO search_index (rowid, title, note, date) "
+            f"SELECT {rowid.format(row=table)}, title, note, "
+            f"{day.format(row=table)} FROM {table} "
+            "WHERE title IS NOT NULL OR note IS NOT NULL"
+        )
+    conn.exec_driver_sql("INSERT INTO search_index (search_index) VALUES ('optimize')")
+
+
+def match_expression(query: str) -> str:
+    """Every word of ``query`` must match, the last one as a prefix.
+
+    Words are quoted, so FTS5 operators typed by the user are plain text.
+    """
+    words = _WORD.findall(query)
+    if not words:
+        raise HTTPException(status_code=400, detail="Empty search query")
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_query(query: str, from_date, to_date, after, limit: int):
+    """Matches ranked by bm25, resumed by keyset on (score, rowid)."""
+    score = f"bm25(search_index, {TITLE_WEIGHT}, {NOTE_WEIGHT})"
+    conditions = ["search_index MATCH :match"]
+    params = {"match": match_expression(query), "limit": limit}
+    if from_date:
+        conditions.append("date >= :from_date")
+        params["from_date"] = from_date
+    if to_date:
+        conditions.append("date <= :to_date")
+        params["to_date"] = to_date
+    if after:
+        params["after_score"], params["after_rowid"] = decode_score_cursor(after)
+        conditions.append(f"({score}, rowid) > (:after_score, :after_rowid)")
+    statement = text(
+        f"SELECT rowid, {score} AS score, date, "
+        f"highlight(search_index, 0, char(2), char(3)) AS title, "
+        f"snippet(search_index, 1, char(2), char(3), '…', {SNIPPET_TOKENS}) "
+        "AS note "
+        f"FROM search_index WHERE {' AND '.join(conditions)} "
+        "ORDER BY score, rowid LIMIT :limit"
+    )
+    return statement, params
+
+
+def _marked(value):
+    if not value:
+        return None
+    escaped = html.escape(value, quote=False)
+    return escaped.replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+
+def to_hits(rows) -> list:
+    """Result rows as SearchHit fields, with HTML-escaped highlights."""
+    return [
+        {
+            "kind": "task" if row.rowid < 0 else "session",
+            "id": abs(row.rowid),
+            "date": row.date,
+            "title": _marked(row.title),
+            "note": _marked(row.note),
+            "score": row.score,
+        }
+        for row in rows
+    ]
+
+
+def next_cursor(rows, limit: int):
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_score_cursor(last.score, last.rowid)
@@ -0,0 +1,29 @@
+"""Direct JSON encoding for list endpoints.
+
+Rows are selected as plain column tuples and encoded with orjson, skipping
+ORM hydration and per-row response_model validation. The columns follow
+the response model's field order, so the bytes match what FastAPI would
+send for the same rows.
+"""
+
+import orjson
+from fastapi import Response
+
+from .models import Session, Task
+from .schemas import SessionResponse, TaskResponse
+
+
+def columns_for(model, schema) -> tuple:
+    return tuple(model.__table__.c[name] for name in schema.model_fields)
+
+
+SESSION_COLUMNS = columns_for(Session, SessionResponse)
+TASK_COLUMNS = columns_for(Task, TaskResponse)
+
+
+def rows_to_json(rows) -> bytes:
+    return orjson.dumps([row._asdict() for row in rows])
+
+
+def json_response(content: bytes, headers=None) -> Response:
+    return Response(content=content, media_type="application/json", headers=headers)
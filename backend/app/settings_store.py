@@ -0,0 +1,104 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .db import current_database
+from .models import PauseCard, Settings
+from .utils import compile_dayparts
+
+
+def default_dayparts():
+    return [
+        {"name": "Matin", "start": "09:00", "end": "12:00"},
+        {"name": "Apres-midi", "start": "13:00", "end": "17:00"},
+        {"name": "Soir", "start": "21:30", "end": "00:00"},
+    ]
+
+
+def get_or_create_settings(db: Session) -> tuple[Settings, bool]:
+    settings = db.query(Settings).first()
+    if settings:
+        return settings, False
+    settings = Settings(
+        dayparts_json=json.dumps(default_dayparts()),
+        default_focus_minutes=45,
+        default_break_minutes=5,
+        notifications_enabled=True,
+        sound_enabled=True,
+    )
+    db.add(settings)
+    db.commit()
+    db.refresh(settings)
+    seed_pause_cards(db)
+    return settings, True
+
+
+def seed_pause_cards(db: Session) -> None:
+    existing = db.query(PauseCard).count()
+    if existing > 0:
+        return
+    cards = [
+        PauseCard(name="Cafe", daily_quota=2, is_joker=False),
+        PauseCard(name="Toilettes", daily_quota=2, is_joker=False),
+        PauseCard(name="Etirements", daily_quota=2, is_joker=False),
+        PauseCard(name="Joker", daily_quota=1, is_joker=True),
+    ]
+    db.add_all(cards)
+    db.commit()
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Immutable copy of the settings row with the dayparts precompiled."""
+
+    id: int
+    version: int
+    dayparts: list
+    default_focus_minutes: int
+    default_break_minutes: int
+    notifications_enabled: bool
+    sound_enabled: bool
+    daypart_table: tuple
+
+    @classmethod
+    def from_row(cls, settings: Settings) -> "SettingsSnapshot":
+        dayparts = json.loads(settings.dayparts_json)
+        return cls(
+            id=settings.id,
+            version=settings.version,
+            dayparts=dayparts,
+            default_focus_minutes=settings.default_focus_minutes,
+            default_break_minutes=settings.default_break_minutes,
+            notifications_enabled=settings.notifications_enabled,
+            sound_enabled=settings.sound_enabled,
+            daypart_table=compile_dayparts(dayparts),
+        )
+
+    def resolve_daypart_name(self, at_dt: datetime) -> str:
+        return self.daypart_table[at_dt.hour * 60 + at_dt.minute]
+
+
+def get_settings_snapshot(db: Session) -> SettingsSnapshot:
+    """Return the cached settings, reloading them if any process changed them.
+
+    The freshness check reads a single integer by primary key; the version
+    column is bumped by every settings update, whichever worker serves it.
+    The snapshot is cached per database.
+    """
+    cache = current_database().cache
+    cached = cache.get("settings")
+    if cached is not None:
+        version = db.execute(
+            select(Settings.version).where(Settings.id == cached.id)
+        ).scalar()
+        if version == cached.version:
+            return cached
+    settings, _ = get_or_create_settings(db)
+    snapshot = cache["settings"] = SettingsSnapshot.from_row(settings)
+    return snapshot
+
+
+def invalidate_settings_snapshot() -> None:
+    current_database().cache.pop("settings", None)
@@ -0,0 +1,178 @@
+"""Multi-tenant mode: one SQLite database per user.
+
+Enabled by TOMATE_TENANTS_DIR. Every /api request names its tenant in the
+TOMATE_TENANT_HEADER header (set by the authenticating proxy) and is
+served from ``<TOMATE_TENANTS_DIR>/<tenant>/app.db``, migrated on first
+access. Open databases live in an LRU registry: beyond
+TOMATE_MAX_OPEN_TENANTS, or after TOMATE_TENANT_IDLE_SECONDS without a
+request, idle ones have their engines disposed.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from . import metrics, migrations
+from .db import Database, using
+
+TENANTS_DIR = os.getenv("TOMATE_TENANTS_DIR")
+MULTI_TENANT = bool(TENANTS_DIR)
+TENANT_HEADER = os.getenv("TOMATE_TENANT_HEADER", "X-Tomate-Tenant").lower()
+MAX_OPEN_TENANTS = int(os.getenv("TOMATE_MAX_OPEN_TENANTS", "128"))
+TENANT_IDLE_SECONDS = float(os.getenv("TOMATE_TENANT_IDLE_SECONDS", "600"))
+# Pooled connections kept per tenant; overflow still follows
+# TOMATE_DB_MAX_OVERFLOW, so a busy tenant is not capped by it.
+TENANT_POOL_SIZE = int(os.getenv("TOMATE_TENANT_POOL_SIZE", "2"))
+
+TENANT_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class Tenant:
+    def __init__(self, database: Database):
+        self.database = database
+        self.active = 0
+        self.last_used = time.monotonic()
+        # Held while migrating, so concurrent first requests wait for it.
+        self.ready = threading.Lock()
+        self.migrated = False
+
+
+class TenantRegistry:
+    """LRU of open tenant databases; only idle tenants are ever closed.
+
+    The limit is soft: when every open tenant has a request in flight
+    (an SSE stream counts), a new one is opened anyway.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.tenants: "OrderedDict[str, Tenant]" = OrderedDict()
+
+    def _open(self, name: str) -> Tenant:
+        path = os.path.join(self.directory, name, "app.db")
+        database = Database(f"sqlite:///{path}", key=name, pool_size=TENANT_POOL_SIZE)
+        metrics.instrument_engine(database.engine)
+        if database.async_engine is not None:
+            metrics.instrument_engine(database.async_engine.sync_engine)
+        return Tenant(database)
+
+    def _evict(self, now: float) -> list:
+        """Pop idle tenants past the size or idle limits, oldest first."""
+        evicted = []
+        for name, tenant in list(self.tenants.items()):
+            over_limit = len(self.tenants) > MAX_OPEN_TENANTS
+            expired = now - tenant.last_used > TENANT_IDLE_SECONDS
+            if not over_limit and not expired:
+                break
+            if tenant.active == 0:
+                del self.tenants[name]
+                evicted.append(tenant.database)
+        return evicted
+
+    def acquire(self, name: str) -> tuple:
+        """Return (tenant, evicted databases); the caller closes the latter.
+
+        Does no I/O (engines connect lazily), so it can run on the event
+        loop. A tenant must be prepare()d before use.
+        """
+        now = time.monotonic()
+        with self.lock:
+            tenant = self.tenants.get(name)
+            if tenant is None:
+                tenant = self.tenants[name] = self._open(name)
+            else:
+                self.tenants.move_to_end(name)
+            tenant.active += 1
+            tenant.last_used = now
+            return tenant, self._evict(now)
+
+    def prepare(self, tenant: Tenant) -> None:
+        """Create and migrate the tenant's database on its first access."""
+        with tenant.ready:
+            if not tenant.migrated:
+                os.makedirs(os.path.dirname(tenant.database.path), exist_ok=True)
+                with using(tenant.database):
+                    migrations.migrate(tenant.database.engine)
+                tenant.migrated = True
+
+    def release(self, tenant: Tenant) -> None:
+        with self.lock:
+            tenant.active -= 1
+            tenant.last_used = time.monotonic()
+
+    def sweep(self) -> list:
+        with self.lock:
+            return self._evict(time.monotonic())
+
+    def open_tenants(self) -> list:
+        with self.lock:
+            return list(self.tenants.values())
+
+
+registry: Optional[TenantRegistry] = (
+    TenantRegistry(TENANTS_DIR) if MULTI_TENANT else None
+)
+
+
+async def close_databases(databases) -> None:
+    for database in databases:
+        await database.close()
+
+
+class TenantMiddleware:
+    """Pure ASGI middleware binding each /api request to its tenant's database.
+
+    Other paths (/metrics) run without a tenant. Responses get a Vary on
+    the tenant header, since the same URL serves different data per user.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.header = TENANT_HEADER.encode("latin-1")
+        self.vary = (b"vary", self.header)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        name = None
+        for key, value in scope["headers"]:
+            if key == self.header:
+                name = value.decode("latin-1")
+                break
+        if name is None or not TENANT_PATTERN.fullmatch(name):
+            response = JSONResponse(
+                {"detail": f"Missing or invalid {TENANT_HEADER} header"},
+                status_code=400,
+            )
+            await response(scope, receive, send)
+            return
+        tenant, evicted = registry.acquire(name)
+        try:
+            await close_databases(evicted)
+            if not tenant.migrated:
+                await run_in_threadpool(registry.prepare, tenant)
+        except BaseException:
+            registry.release(tenant)
+            raise
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), self.vary],
+                }
+            await send(message)
+
+        try:
+            with using(tenant.database):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.release(tenant)
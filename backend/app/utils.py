@@ -1,4 +1,7 @@
 from datetime import datetime, time
+from functools import lru_cache
+
+MINUTES_PER_DAY = 24 * 60
 
 
 def parse_time(value: str) -> time:
@@ -8,18 +11,40 @@ def parse_time(value: str) -> time:
     return time(hour=hour, minute=minute)
 
 
-def resolve_daypart_name(dayparts, at_dt: datetime) -> str:
-    current = at_dt.time()
-    for daypart in dayparts:
-        start = parse_time(daypart["start"])
-        end = parse_time(daypart["end"])
+def time_to_minutes(value: str) -> int:
+    parsed = parse_time(value)
+    return parsed.hour * 60 + parsed.minute
+
+
+def compile_dayparts(dayparts) -> tuple:
+    """Return a minute-of-day table mapping each minute to its daypart name.
+
+    Earlier dayparts win when ranges overlap, and minutes covered by no
+    daypart fall back to the first one, as resolve_daypart_name always did.
+    """
+    table = [dayparts[0]["name"]] * MINUTES_PER_DAY
+    for daypart in reversed(dayparts):
+        start = time_to_minutes(daypart["start"])
+        end = time_to_minutes(daypart["end"])
         if start <= end:
-            if start <= current < end:
-                return daypart["name"]
+            minutes = range(start, end)
         else:
-            if current >= start or current < end:
-                return daypart["name"]
-    return dayparts[0]["name"]
+            minutes = [*range(start, MINUTES_PER_DAY), *range(0, end)]
+        for minute in minutes:
+            table[minute] = daypart["name"]
+    return tuple(table)
+
+
+@lru_cache(maxsize=32)
+def _compiled_dayparts(key: tuple) -> tuple:
+    return compile_dayparts(
+        [{"name": name, "start": start, "end": end} for name, start, end in key]
+    )
+
+
+def resolve_daypart_name(dayparts, at_dt: datetime) -> str:
+    key = tuple((dp["name"], dp["start"], dp["end"]) for dp in dayparts)
+    return _compiled_dayparts(key)[at_dt.hour * 60 + at_dt.minute]
 
 
 def get_daypart_start(dayparts, daypart_name: str) -> time:
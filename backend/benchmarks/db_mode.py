@@ -0,0 +1,134 @@
+"""Latency of the sync and async database modes under many clients.
+
+Seeds a temp database once, then for each TOMATE_DB_MODE starts uvicorn
+on it and has ``--clients`` concurrent clients each send ``--requests``
+of the read-heavy GETs that have an async handler (sessions, tasks,
+pause cards, daily state), in turn. Reports p50/p99 per mode, with the
+status counts: pool timeouts show up as 500s.
+
+    python -m benchmarks.db_mode --clients 128 --requests 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import httpx
+
+from .tenants import free_port, percentiles
+
+MODES = ("sync", "async")
+
+
+def client_requests(today: str) -> list:
+    month_ago = (date.fromisoformat(today) - timedelta(days=30)).isoformat()
+    return [
+        ("/api/v1/sessions", {"from": month_ago, "to": today}),
+        ("/api/v1/tasks", {"limit": 100}),
+        ("/api/v1/pause-cards", {}),
+        ("/api/v1/daily-state", {"date": today}),
+    ]
+
+
+def visit(client: httpx.Client, offset: int, count: int, timings: list) -> Counter:
+    statuses: Counter = Counter()
+    requests = client_requests(date.today().isoformat())
+    for index in range(count):
+        path, params = requests[(offset + index) % len(requests)]
+        started = time.perf_counter()
+        try:
+            statuses[client.get(path, params=params).status_code] += 1
+        except httpx.TransportError as error:
+            statuses[type(error).__name__] += 1
+        timings.append(time.perf_counter() - started)
+    return statuses
+
+
+def run_mode(mode: str, env: dict, args) -> dict:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--port", str(port), "--log-level", "warning"],
+        env=dict(env, TOMATE_DB_MODE=mode),
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        limits = httpx.Limits(max_connections=args.clients)
+        with httpx.Client(base_url=base, limits=limits, timeout=120) as client:
+            for _ in range(100):
+                try:
+                    client.get("/metrics")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            # Warm up: open the pooled connections, fill the page cache.
+            visit(client, 0, 20, [])
+            timings: list = []
+            statuses: Counter = Counter()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(args.clients) as executor:
+                for result in executor.map(
+                    lambda offset: visit(client, offset, args.requests, timings),
+                    range(args.clients),
+                ):
+                    statuses.update(result)
+            elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+    result = {
+        "mode": mode,
+        "seconds": elapsed,
+        "requests_per_s": len(timings) / elapsed,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        **percentiles(timings),
+    }
+    print(json.dumps(result), file=sys.stderr)
+    return result
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="tomate-db-mode-") as tmp:
+        env = dict(
+            os.environ,
+            TOMATE_DATABASE_URL=f"sqlite:///{tmp}/app.db",
+            TOMATE_MAINTENANCE_INTERVAL="0",
+        )
+        subprocess.run(
+            [sys.executable, "-c",
+             "from app import migrations; from app.db import engine; "
+             "from benchmarks.seed import seed; "
+             f"migrations.migrate(engine); seed({args.sessions})"],
+            env=env,
+            check=True,
+        )
+        modes = [run_mode(mode, env, args) for mode in args.modes.split(",")]
+    return {
+        "sessions": args.sessions,
+        "clients": args.clients,
+        "requests_per_client": args.requests,
+        "cpus": os.cpu_count(),
+        "modes": modes,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.db_mode")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--clients", type=int, default=128)
+    parser.add_argument("--requests", type=int, default=10)
+    args = parser.parse_args(argv)
+    json.dump(run(args), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Stress test of pause card quotas across several uvicorn workers.
+
+Starts uvicorn with --workers on a temp database, then, for each round,
+creates a card with a small daily quota and fires many concurrent
+consumes at it. Afterwards the database must hold exactly ``quota``
+break sessions for the card, each with its use, and a matching counter;
+anything else (overspent quota, orphaned session, 5xx) fails the run.
+
+    python -m benchmarks.pause_quota --workers 4 --rounds 20 --consumers 32
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from .tenants import free_port, percentiles
+
+
+def consume(client: httpx.Client, card_id: int, timings: list) -> int:
+    started = time.perf_counter()
+    response = client.post("/api/v1/pause/consume", json={"pause_card_id": card_id})
+    timings.append(time.perf_counter() - started)
+    return response.status_code
+
+
+def check_database(path: str, quotas: dict) -> list:
+    """Compare every card's sessions, uses and counter to its quota."""
+    errors = []
+    conn = sqlite3.connect(path)
+    try:
+        orphans = conn.execute(
+            "SELECT count(*) FROM sessions WHERE kind = 'break' AND id NOT IN "
+            "(SELECT session_id FROM pause_card_uses)"
+        ).fetchone()[0]
+        if orphans:
+            errors.append(f"{orphans} break sessions without a pause card use")
+        for card_id, quota in quotas.items():
+            uses = conn.execute(
+                "SELECT count(*) FROM pause_card_uses WHERE pause_card_id = ?",
+                (card_id,),
+            ).fetchone()[0]
+            used = conn.execute(
+                "SELECT coalesce(sum(used), 0) FROM pause_card_usage "
+                "WHERE pause_card_id = ?",
+                (card_id,),
+            ).fetchone()[0]
+            if uses != quota or used != quota:
+                errors.append(
+                    f"card {card_id}: quota {quota}, {uses} uses, counter {used}"
+                )
+    finally:
+        conn.close()
+    return errors
+
+
+def run(args) -> dict:
+    port = free_port()
+    with tempfile.TemporaryDirectory(prefix="tomate-pause-") as tmp:
+        path = os.path.join(tmp, "app.db")
+        env = dict(
+            os.environ,
+            TOMATE_DATABASE_URL=f"sqlite:///{path}",
+            TOMATE_MAINTENANCE_INTERVAL="0",
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--port", str(port), "--workers", str(args.workers),
+             "--log-level", "warning"],
+            env=env,
+        )
+        try:
+            base = f"http://127.0.0.1:{port}"
+            limits = httpx.Limits(max_connections=args.consumers)
+            with httpx.Client(base_url=base, limits=limits, timeout=60) as client:
+                for _ in range(100):
+                    try:
+                        client.get("/metrics")
+                        break
+                    except httpx.TransportError:
+                        time.sleep(0.1)
+                statuses: Counter = Counter()
+                timings: list = []
+                quotas = {}
+                started = time.perf_counter()
+                for round_no in range(args.rounds):
+                    card = client.post(
+                        "/api/v1/pause-cards",
+                        json={"name": f"card-{round_no}", "daily_quota": args.quota},
+                    ).json()
+                    quotas[card["id"]] = args.quota
+                    with ThreadPoolExecutor(args.consumers) as executor:
+                        statuses.update(
+                            executor.map(
+                                lambda _: consume(client, card["id"], timings),
+                                range(args.consumers),
+                            )
+                        )
+                elapsed = time.perf_counter() - started
+        finally:
+            server.terminate()
+            server.wait()
+        errors = check_database(path, quotas)
+    expected = {
+        200: args.rounds * args.quota,
+        400: args.rounds * (args.consumers - args.quota),
+    }
+    if dict(statuses) != expected:
+        errors.append(f"statuses {dict(statuses)}, expected {expected}")
+    return {
+        "workers": args.workers,
+        "rounds": args.rounds,
+        "consumers": args.consumers,
+        "quota": args.quota,
+        "seconds": elapsed,
+        "statuses": dict(statuses),
+        **percentiles(timings),
+        "errors": errors,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.pause_quota")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--consumers", type=int, default=32)
+    parser.add_argument("--quota", type=int, default=2)
+    args = parser.parse_args(argv)
+    result = run(args)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    if result["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Write throughput of the SQLite engine profile against SQLite's defaults.
+
+For each profile, starts uvicorn with ``--workers`` on a fresh temp
+database and has ``--clients`` concurrent clients run two scenarios:
+stopping ``--sessions`` running sessions, then stopping as many again
+interleaved with listing the day they are on (``--sessions`` to twice
+that many rows). Reports req/s and latency percentiles per scenario,
+with the status counts: lock timeouts show up as 500s.
+
+``default`` is the profile of db.py; ``sqlite`` is what the app ran with
+before it: rollback journal, synchronous=FULL, no mmap, a 2 MiB cache
+and pysqlite's 5 s busy timeout, on SQLAlchemy's 5 + 10 pool.
+
+    python -m benchmarks.pragmas --workers 2 --clients 32 --sessions 400
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import httpx
+
+from .tenants import free_port, percentiles
+
+PROFILES = {
+    "sqlite": {
+        "TOMATE_SQLITE_JOURNAL_MODE": "DELETE",
+        "TOMATE_SQLITE_SYNCHRONOUS": "FULL",
+        "TOMATE_SQLITE_MMAP_SIZE": "0",
+        "TOMATE_SQLITE_CACHE_SIZE": "-2000",
+        "TOMATE_SQLITE_BUSY_TIMEOUT_MS": "5000",
+        "TOMATE_DB_POOL_SIZE": "5",
+        "TOMATE_DB_MAX_OVERFLOW": "10",
+    },
+    "default": {},
+}
+
+
+def start_sessions(client: httpx.Client, count: int) -> list:
+    return [
+        client.post("/api/v1/sessions/start", json={"kind": "focus"}).json()["id"]
+        for _ in range(count)
+    ]
+
+
+def call(client: httpx.Client, request, timings: list) -> str:
+    method, path, params = request
+    started = time.perf_counter()
+    try:
+        status = client.request(method, path, params=params).status_code
+    except httpx.TransportError as error:
+        status = type(error).__name__
+    timings.append(time.perf_counter() - started)
+    return str(status)
+
+
+def run_scenario(client: httpx.Client, requests: list, clients: int) -> dict:
+    timings: list = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        statuses = Counter(
+            executor.map(lambda request: call(client, request, timings), requests)
+        )
+    elapsed = time.perf_counter() - started
+    return {
+        "seconds": elapsed,
+        "requests_per_s": len(requests) / elapsed,
+        "statuses": dict(statuses),
+        **percentiles(timings),
+    }
+
+
+def run_profile(name: str, args) -> dict:
+    today = date.today().isoformat()
+    with tempfile.TemporaryDirectory(prefix="tomate-pragmas-") as tmp:
+        env = dict(
+            os.environ,
+            **PROFILES[name],
+            TOMATE_DATABASE_URL=f"sqlite:///{tmp}/app.db",
+            TOMATE_MAINTENANCE_INTERVAL="0",
+            TOMATE_DB_MODE="sync",
+        )
+        # Migrate once, before the workers race to.
+        subprocess.run(
+            [sys.executable, "-c",
+             "from app import migrations; from app.db import engine; "
+             "migrations.migrate(engine)"],
+            env=env,
+            check=True,
+        )
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            env=env,
+        )
+        try:
+            base = f"http://127.0.0.1:{port}"
+            limits = httpx.Limits(max_connections=args.clients)
+            with httpx.Client(base_url=base, limits=limits, timeout=120) as client:
+                for _ in range(100):
+                    try:
+                        client.get("/api/v1/settings")
+                        break
+                    except httpx.TransportError:
+                        time.sleep(0.1)
+                stops = [
+                    ("POST", f"/api/v1/sessions/{session_id}/stop", None)
+                    for session_id in start_sessions(client, args.sessions)
+                ]
+                stop = run_scenario(client, stops, args.clients)
+                day = ("GET", "/api/v1/sessions", {"from": today, "to": today})
+                mixed = []
+                for session_id in start_sessions(client, args.sessions):
+                    mixed += [("POST", f"/api/v1/sessions/{session_id}/stop", None), day]
+                stop_and_list = run_scenario(client, mixed, args.clients)
+        finally:
+            server.terminate()
+            server.wait()
+    result = {"profile": name, "stop": stop, "stop_and_list": stop_and_list}
+    print(json.dumps(result), file=sys.stderr)
+    return result
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.pragmas")
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--sessions", type=int, default=400)
+    args = parser.parse_args(argv)
+    result = {
+        "workers": args.workers,
+        "clients": args.clients,
+        "sessions": args.sessions,
+        "cpus": os.cpu_count(),
+        "profiles": [run_profile(name, args) for name in args.profiles.split(",")],
+    }
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+"""Microbenchmarks for utils, serialization and every API endpoint.
+
+Each database size runs in its own subprocess against a temp SQLite file,
+because the engine is bound to TOMATE_DATABASE_URL at import time.
+
+    python -m benchmarks.run --sizes 1000,100000 --output baseline.json
+    python -m benchmarks.run --sizes 1000,100000 --compare baseline.json
+
+With --compare the run exits with status 1 when any benchmark's median is
+more than --threshold (default 0.25, i.e. 25%) slower than the baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+DEFAULT_SIZES = "1000,100000,1000000"
+MIN_ROUNDS = 3
+MAX_ROUNDS = 200
+MIN_TIME = 0.5
+
+
+def measure(call, prepare=None) -> dict:
+    """Time ``call`` until MIN_TIME has elapsed, within the round limits.
+
+    ``prepare`` builds the argument of each round (e.g. a fresh session to
+    stop) and is not timed.
+    """
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < MAX_ROUNDS and (
+        len(timings) < MIN_ROUNDS or time.perf_counter() - started < MIN_TIME
+    ):
+        argument = prepare() if prepare else None
+        t0 = time.perf_counter()
+        result = call(argument) if prepare else call()
+        timings.append(time.perf_counter() - t0)
+        status = getattr(result, "status_code", 200)
+        if status >= 400:
+            raise RuntimeError(f"HTTP {status}: {result.text[:200]}")
+    return {
+        "median_us": statistics.median(timings) * 1e6,
+        "min_us": min(timings) * 1e6,
+        "mean_us": statistics.fmean(timings) * 1e6,
+        "rounds": len(timings),
+    }
+
+
+def utils_cases():
+    from app import utils
+    from app.settings_store import default_dayparts
+
+    dayparts = default_dayparts()
+    at = datetime(2024, 5, 6, 14, 30)
+    return {
+        "utils.parse_time": lambda: utils.parse_time("09:30"),
+        "utils.resolve_daypart_name": lambda: utils.resolve_daypart_name(dayparts, at),
+        "utils.build_datetime": lambda: utils.build_datetime("2024-05-06", "09:30"),
+    }
+
+
+def serialization_cases():
+    from sqlalchemy import select
+
+    from app import serialization
+    from app.db import SessionLocal
+    from app.models import Session as SessionModel
+    from app.schemas import SessionResponse
+
+    with SessionLocal() as db:
+        sessions = db.scalars(select(SessionModel).limit(500)).all()
+        db.expunge_all()
+
+    def dump():
+        return [SessionResponse.model_validate(s).model_dump(mode="json") for s in sessions]
+
+    # The list endpoints' path before and after serialization.rows_to_json,
+    # from the query to the response body.
+    range_query = select(SessionModel).order_by(SessionModel.start_at).limit(10000)
+    columns_query = (
+        select(*serialization.SESSION_COLUMNS).order_by(SessionModel.start_at).limit(10000)
+    )
+
+    def orm_range():
+        with SessionLocal() as db:
+            rows = db.scalars(range_query).all()
+            return json.dumps(
+                [SessionResponse.model_validate(s).model_dump(mode="json") for s in rows]
+            )
+
+    def columns_range():
+        with SessionLocal() as db:
+            return serialization.rows_to_json(db.execute(columns_query).all())
+
+    return {
+        f"serialize.SessionResponse x{len(sessions)}": dump,
+        "serialize.sessions ORM + pydantic x10000": orm_range,
+        "serialize.sessions columns + orjson x10000": columns_range,
+    }
+
+
+def endpoint_cases(client):
+    """One case per endpoint; SSE (/events) is left out as it never ends."""
+    from benchmarks.seed import SESSIONS_PER_DAY
+
+    today = date.today().isoformat()
+    month_ago = (date.today() - timedelta(days=30)).isoformat()
+    year_ago = (date.today() - timedelta(days=365)).isoformat()
+    ten_thousand_ago = (
+        date.today() - timedelta(days=10000 // SESSIONS_PER_DAY)
+    ).isoformat()
+    scratch = "1999-01-01"
+    reset_scratch = "1999-02-01"
+    counter = iter(range(10**9))
+
+    def get(path, **params):
+        return lambda: client.get(path, params=params)
+
+    def post(path, json=None, **params):
+        return lambda: client.post(path, json=json, params=params)
+
+    def plan(day=scratch, minutes=25):
+        return client.post(
+            "/api/v1/sessions/plan",
+            json={
+                "kind": "focus",
+                "date": day,
+                "daypart_name": "Matin",
+                "planned_time": "09:00",
+                "minutes": minutes,
+            },
+        ).json()["id"]
+
+    def start():
+        return client.post("/api/v1/sessions/start", json={"kind": "focus"}).json()["id"]
+
+    def new_task():
+        return client.post(
+            "/api/v1/tasks", json={"title": "bench", "estimate_pomodoros": 1}
+        ).json()["id"]
+
+    settings = client.get("/api/v1/settings").json()
+    settings.pop("needs_setup")
+    task_id = new_task()
+    session_id = plan()
+    card = client.post(
+        "/api/v1/pause-cards", json={"name": "Bench", "daily_quota": 10**9}
+    ).json()
+    entries = [
+        {"daypart_name": "Matin", "planned_time": f"{9 + hour:02d}:00", "minutes": 25}
+        for hour in range(4)
+    ]
+    template_id = client.post(
+        "/api/v1/day-templates", json={"name": "bench", "entries": entries}
+    ).json()["id"]
+    import_body = "\n".join(
+        json.dumps(
+            {
+                "table": "sessions",
+                "row": {
+                    "kind": "focus",
+                    "start_at": f"1998-01-01T{8 + i // 60:02d}:{i % 60:02d}:00",
+                    "planned_minutes": 25,
+                },
+            }
+        )
+        for i in range(100)
+    )
+    recent = (datetime.utcnow() - timedelta(minutes=5)).isoformat()
+    latest = 0
+
+    def latest_version():
+        """Page /changes up to the current version, from the last one seen."""
+        nonlocal latest
+        while True:
+            page = client.get("/api/v1/changes", params={"since": latest}).json()
+            if page["version"] == latest:
+                return latest
+            latest = page["version"]
+
+    cases = {
+        "GET /settings": get("/api/v1/settings"),
+        "PUT /settings": lambda: client.put("/api/v1/settings", json=settings),
+        "GET /daily-state": get("/api/v1/daily-state", date=today),
+        "GET /bootstrap": get("/api/v1/bootstrap", date=today),
+        "GET /tasks": get("/api/v1/tasks"),
+        "GET /tasks?limit=100": get("/api/v1/tasks", limit=100),
+        "POST /tasks": post(
+            "/api/v1/tasks", json={"title": "bench", "estimate_pomodoros": 1}
+        ),
+        "PUT /tasks/{id}": lambda: client.put(
+            f"/api/v1/tasks/{task_id}", json={"note": "bench"}
+        ),
+        "POST /tasks/{id}/complete": (
+            lambda task: client.post(f"/api/v1/tasks/{task}/complete"),
+            new_task,
+        ),
+        "GET /sessions (1 day)": get("/api/v1/sessions", **{"from": today, "to": today}),
+        "GET /sessions (30 days)": get(
+            "/api/v1/sessions", **{"from": month_ago, "to": today}
+        ),
+        "GET /sessions (10k rows)": get(
+            "/api/v1/sessions", **{"from": ten_thousand_ago, "to": today}
+        ),
+        "GET /sessions (30 days, limit=100)": get(
+            "/api/v1/sessions", limit=100, **{"from": month_ago, "to": today}
+        ),
+        "GET /sessions/export (30 days)": get(
+            "/api/v1/sessions/export", **{"from": month_ago, "to": today}
+        ),
+        "GET /sessions/next-slot": get(
+            "/api/v1/sessions/next-slot", date=today, daypart_name="Apres-midi",
+            minutes=25,
+        ),
+        "POST /sessions/start": post("/api/v1/sessions/start", json={"kind": "focus"}),
+        "POST /sessions/plan": lambda: client.post(
+            "/api/v1/sessions/plan",
+            json={
+                "kind": "focus",
+                "date": scratch,
+                "daypart_name": "Matin",
+                "planned_time": "10:00",
+            },
+        ),
+        "POST /sessions/plan-day": post(
+            "/api/v1/sessions/plan-day", template=template_id, date=scratch
+        ),
+        "POST /sessions/{id}/start": (
+            lambda sid: client.post(f"/api/v1/sessions/{sid}/start"),
+            plan,
+        ),
+        "POST /sessions/{id}/stop": (
+            lambda sid: client.post(f"/api/v1/sessions/{sid}/stop"),
+            start,
+        ),
+        "POST /sessions/{id}/skip": (
+            lambda sid: client.post(f"/api/v1/sessions/{sid}/skip"),
+            plan,
+        ),
+        "POST /sessions/{id}/adjust": post(
+            f"/api/v1/sessions/{session_id}/adjust", json={"minutes_delta": 0}
+        ),
+        "POST /sessions/{id}/reset": (
+            lambda sid: client.post(f"/api/v1/sessions/{sid}/reset"),
+            plan,
+        ),
+        "POST /sessions/{id}/merge-next": (
+            lambda sid: client.post(f"/api/v1/sessions/{sid}/merge-next"),
+            lambda: (plan(today, 1), start())[1],
+        ),
+        "PUT /sessions/{id}": lambda: client.put(
+            f"/api/v1/sessions/{session_id}", json={"note": "bench"}
+        ),
+        "POST /sessions/reset-day": (
+            lambda day: client.post(
+                "/api/v1/sessions/reset-day", params={"date": day, "mode": "all"}
+            ),
+            lambda: (plan(reset_scratch), reset_scratch)[1],
+        ),
+        "GET /pause-cards": get("/api/v1/pause-cards"),
+        "POST /pause-cards": post(
+            "/api/v1/pause-cards", json={"name": "bench", "daily_quota": 1}
+        ),
+        "PUT /pause-cards/{id}": lambda: client.put(
+            f"/api/v1/pause-cards/{card['id']}", json={"daily_quota": 10**9}
+        ),
+        "POST /pause-cards/reset": post("/api/v1/pause-cards/reset", date=scratch),
+        "POST /pause/consume": post(
+            "/api/v1/pause/consume", json={"pause_card_id": card["id"]}
+        ),
+        "GET /day-templates": get("/api/v1/day-templates"),
+        "POST /day-templates": (
+            lambda name: client.post(
+                "/api/v1/day-templates", json={"name": name, "entries": entries}
+            ),
+            lambda: f"bench-{next(counter)}",
+        ),
+        "PUT /day-templates/{id}": lambda: client.put(
+            f"/api/v1/day-templates/{template_id}", json={"entries": entries}
+        ),
+        "POST /batch (3 ops)": lambda: client.post(
+            "/api/v1/batch",
+            json={
+                "operations": [
+                    {"op": "update_task", "id": task_id, "data": {"note": "b"}},
+                    {"op": "update_session", "id": session_id, "data": {"note": "b"}},
+                    {"op": "adjust_session", "id": session_id,
+                     "data": {"minutes_delta": 0}},
+                ]
+            },
+        ),
+        "POST /import (100 sessions)": lambda: client.post(
+            "/api/v1/import", content=import_body
+        ),
+        "GET /export/sqlite": get("/api/v1/export/sqlite"),
+        "GET /export/changes (last 5 min)": get("/api/v1/export/changes", since=recent),
+        "GET /changes (since=0)": get("/api/v1/changes", since=0),
+        # A client polling /changes is usually at the latest version, which
+        # the cases above have moved.
+        "GET /changes (latest)": (
+            lambda since: client.get("/api/v1/changes", params={"since": since}),
+            latest_version,
+        ),
+        "GET /search (task titles)": get("/api/v1/search", q="task"),
+        "GET /search (no match)": get("/api/v1/search", q="introuvable"),
+        "GET /stats (year by month)": get(
+            "/api/v1/stats", group_by="month", **{"from": year_ago, "to": today}
+        ),
+        "GET /stats (year by task)": get(
+            "/api/v1/stats", group_by="task", **{"from": year_ago, "to": today}
+        ),
+    }
+    return cases
+
+
+def run_size(size: int, pattern: str) -> dict:
+    """Seed a temp database with ``size`` sessions and run every case on it."""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from benchmarks.seed import seed
+
+    with TestClient(app) as client:  # runs the lifespan, hence migrations
+        client.get("/api/v1/settings")  # creates the settings and pause cards
+        started = time.perf_counter()
+        seed(size)
+        print(
+            f"[{size}] seeded in {time.perf_counter() - started:.1f}s", file=sys.stderr
+        )
+        cases = {}
+        cases.update(utils_cases())
+        cases.update(serialization_cases())
+        cases.update(endpoint_cases(client))
+        results = {}
+        for name, case in cases.items():
+            if not re.search(pattern, name):
+                continue
+            call, prepare = case if isinstance(case, tuple) else (case, None)
+            results[name] = measure(call, prepare)
+            print(
+                f"[{size}] {name}: {results[name]['median_us']:.0f} us",
+                file=sys.stderr,
+            )
+    return results
+
+
+def spawn(size: int, pattern: str) -> dict:
+    with tempfile.TemporaryDirectory(prefix="tomate-bench-") as tmp:
+        env = dict(os.environ, TOMATE_DATABASE_URL=f"sqlite:///{tmp}/bench.db")
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--worker", str(size),
+             "--filter", pattern],
+            env=env,
+            check=True,
+            stdout=subprocess.PIPE,
+        ).stdout
+    return json.loads(output)
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Print median ratios; return the benchmarks slower than the threshold."""
+    regressions = []
+    for size, cases in current["results"].items():
+        for name, result in cases.items():
+            before = baseline["results"].get(size, {}).get(name)
+            if before is None:
+                continue
+            ratio = result["median_us"] / before["median_us"]
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  REGRESSION"
+                regressions.append((size, name, ratio))
+            print(f"{size:>8} {name:<45} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--filter", default="", help="regex on benchmark names")
+    parser.add_argument("--output", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker is not None:
+        json.dump(run_size(args.worker, args.filter), sys.stdout)
+        return
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    current = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(),
+        },
+        "results": {str(size): spawn(size, args.filter) for size in sizes},
+    }
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(current, handle, indent=2)
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
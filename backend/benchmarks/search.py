@@ -0,0 +1,133 @@
+"""Benchmark of full-text search on a database of session notes.
+
+Seeds a temp database with ``--notes`` sessions, each with a short note
+drawn from a fixed vocabulary (so a word matches 1/len(WORDS) to 3/len
+of the rows), then times indexing and GET /api/v1/search queries.
+
+    python -m benchmarks.search --notes 1000000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+WORDS = (
+    "revue code client appel réunion rédaction lecture tests déploiement "
+    "courriel budget planning sprint design bug migration facture rapport "
+    "formation entretien"
+).split()
+SESSIONS_PER_DAY = 12
+ROUNDS = 20
+
+
+def seed_notes(conn, notes: int) -> None:
+    """Insert ``notes`` finished sessions; each note holds three words."""
+    vocabulary = json.dumps(WORDS)
+    size = len(WORDS)
+    conn.exec_driver_sql(
+        "WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n "
+        f"WHERE i < {notes - 1}) "
+        "INSERT INTO sessions (kind, start_at, end_at, planned_minutes, "
+        "actual_minutes, state, note, date, daypart_name, updated_at) "
+        "SELECT 'focus', "
+        f"datetime('2020-01-01', '+' || (i / {SESSIONS_PER_DAY}) || ' days'), "
+        f"datetime('2020-01-01', '+' || (i / {SESSIONS_PER_DAY}) || ' days'), "
+        "25, 25, 'completed', "
+        "'Note ' || i || ' : ' "
+        f"|| json_extract('{vocabulary}', '$[' || (i % {size}) || ']') || ' ' "
+        f"|| json_extract('{vocabulary}', '$[' || (i * 7 % {size}) || ']') || ' ' "
+        f"|| json_extract('{vocabulary}', '$[' || (i * 13 % {size}) || ']'), "
+        f"date('2020-01-01', '+' || (i / {SESSIONS_PER_DAY}) || ' days'), "
+        "'Matin', datetime('2020-01-01') FROM n"
+    )
+
+
+def timed(call) -> dict:
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        response = call()
+        timings.append(time.perf_counter() - started)
+        response.raise_for_status()
+    result = {
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+    }
+    if response.request.method == "GET":
+        result["hits"] = len(response.json())
+    return result
+
+
+def run(notes: int) -> dict:
+    from fastapi.testclient import TestClient
+
+    from app import search
+    from app.db import engine
+    from app.main import app
+
+    results = {"notes": notes}
+    with TestClient(app) as client:
+        with engine.begin() as conn:
+            started = time.perf_counter()
+            seed_notes(conn, notes)
+            results["insert_with_triggers_s"] = time.perf_counter() - started
+        with engine.begin() as conn:
+            started = time.perf_counter()
+            search.rebuild_search_index(conn)
+            results["rebuild_index_s"] = time.perf_counter() - started
+            pages = conn.exec_driver_sql(
+                "SELECT sum(pgsize) FROM dbstat WHERE name LIKE 'search_index%'"
+            ).scalar()
+            results["index_mb"] = (pages or 0) / 1024 / 1024
+        last_day = f"2020-01-{min(28, 1 + notes // SESSIONS_PER_DAY):02d}"
+        queries = {
+            "one word": {"q": "facture"},
+            "accent folded": {"q": "reunion"},
+            "prefix": {"q": "deploi"},
+            "two words": {"q": "code tests"},
+            "exact note": {"q": f"note {notes // 2}"},
+            "one month": {"q": "facture", "from": "2020-01-01", "to": last_day},
+            "no match": {"q": "introuvable"},
+        }
+        searches = {}
+        for name, params in queries.items():
+            searches[name] = timed(
+                lambda: client.get("/api/v1/search", params=params)
+            )
+            print(f"{name}: {searches[name]['median_ms']:.1f} ms", file=sys.stderr)
+        first = client.get("/api/v1/search", params={"q": "facture"})
+        after = first.headers["X-Next-Cursor"]
+        searches["one word, page 2"] = timed(
+            lambda: client.get(
+                "/api/v1/search", params={"q": "facture", "after": after}
+            )
+        )
+        results["searches"] = searches
+        # Write path: each note edit goes through the update trigger.
+        edits = iter(range(10**9))
+        results["PUT /sessions/{id} note"] = timed(
+            lambda: client.put(
+                f"/api/v1/sessions/{1 + next(edits)}", json={"note": "bilan facture"}
+            )
+        )
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.search")
+    parser.add_argument("--notes", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="tomate-search-") as tmp:
+        # The engine is bound to TOMATE_DATABASE_URL at import time.
+        os.environ["TOMATE_DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+        os.environ["TOMATE_MAINTENANCE_INTERVAL"] = "0"
+        json.dump(run(args.notes), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
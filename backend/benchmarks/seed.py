@@ -0,0 +1,64 @@
+"""Fill an empty Tomate database with synthetic history."""
+
+from datetime import date, timedelta
+
+from app import pause_usage, rollups
+from app.db import engine
+
+SESSIONS_PER_DAY = 12
+SESSIONS_PER_TASK = 50
+
+
+def seed(size: int) -> None:
+    """Insert ``size`` sessions ending today, plus tasks and pause card uses.
+
+    Days before today hold finished sessions; today's are still planned, so
+    day-level endpoints have work to do. Uses SQL-side generation because
+    a million ORM inserts would dominate the benchmark run.
+    """
+    days = max(1, size // SESSIONS_PER_DAY)
+    first_day = (date.today() - timedelta(days=days - 1)).isoformat()
+    today = date.today().isoformat()
+    tasks = max(1, size // SESSIONS_PER_TASK)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n "
+            f"WHERE i < {tasks}) "
+            "INSERT INTO tasks (title, estimate_pomodoros, note, status, "
+            "created_at, updated_at) "
+            "SELECT 'Task ' || i, 1 + i % 4, NULL, "
+            "CASE WHEN i % 3 = 0 THEN 'done' ELSE 'active' END, "
+            f"datetime('{first_day}', '+' || (i * {days} / {tasks}) || ' days'), "
+            f"datetime('{first_day}', '+' || (i * {days} / {tasks}) || ' days') "
+            "FROM n"
+        )
+        conn.exec_driver_sql(
+            "WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n "
+            f"WHERE i < {size - 1}), "
+            "s AS (SELECT i, "
+            f"date('{first_day}', '+' || (i / {SESSIONS_PER_DAY}) || ' days') AS day, "
+            f"i % {SESSIONS_PER_DAY} AS slot FROM n) "
+            "INSERT INTO sessions (kind, task_id, start_at, end_at, "
+            "planned_minutes, actual_minutes, state, title, note, date, "
+            "daypart_name, updated_at) "
+            "SELECT CASE WHEN slot % 2 THEN 'break' ELSE 'focus' END, "
+            f"CASE WHEN slot % 2 THEN NULL ELSE 1 + i % {tasks} END, "
+            "datetime(day, '+' || (480 + slot * 50) || ' minutes'), "
+            f"CASE WHEN day = '{today}' THEN NULL "
+            "ELSE datetime(day, '+' || (505 + slot * 50) || ' minutes') END, "
+            "CASE WHEN slot % 2 THEN 5 ELSE 25 END, "
+            f"CASE WHEN day = '{today}' THEN NULL ELSE 25 END, "
+            f"CASE WHEN day = '{today}' THEN 'planned' "
+            "WHEN i % 10 = 0 THEN 'skipped' ELSE 'completed' END, "
+            "NULL, NULL, day, "
+            "CASE WHEN slot < 6 THEN 'Matin' ELSE 'Apres-midi' END, "
+            "datetime(day, '+1 day') "
+            "FROM s"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO pause_card_uses (pause_card_id, date, session_id, used_at) "
+            "SELECT 1 + id % 3, date, id, start_at FROM sessions "
+            "WHERE kind = 'break' AND state = 'completed'"
+        )
+        pause_usage.rebuild_usage(conn)
+        rollups.rebuild_rollups(conn)
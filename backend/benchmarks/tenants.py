@@ -0,0 +1,175 @@
+"""Load test of the multi-tenant mode.
+
+Starts uvicorn on a temp TOMATE_TENANTS_DIR and replays a short visit
+(bootstrap, create a task, start and stop a session, list) for every
+tenant, in shuffled order, from a pool of client threads. The first round
+measures first access (database creation and migrations); later rounds
+reopen tenants the LRU has closed in between.
+
+    python -m benchmarks.tenants --tenants 500 --rounds 3 --concurrency 32
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import httpx
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_stats(pid: int) -> dict:
+    with open(f"/proc/{pid}/status") as handle:
+        rss_kb = next(
+            int(line.split()[1]) for line in handle if line.startswith("VmRSS:")
+        )
+    return {"rss_mb": rss_kb / 1024, "open_fds": len(os.listdir(f"/proc/{pid}/fd"))}
+
+
+def percentiles(timings: list) -> dict:
+    timings = sorted(timings)
+    if not timings:
+        return {}
+
+    def at(q):
+        return timings[min(len(timings) - 1, int(q * len(timings)))] * 1000
+
+    return {
+        "requests": len(timings),
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "max_ms": timings[-1] * 1000,
+    }
+
+
+def visit(client: httpx.Client, tenant: str, timings: list) -> None:
+    headers = {"X-Tomate-Tenant": tenant}
+    today = date.today().isoformat()
+
+    def call(method, path, **kwargs):
+        started = time.perf_counter()
+        response = client.request(method, path, headers=headers, **kwargs)
+        timings.append(time.perf_counter() - started)
+        response.raise_for_status()
+        return response
+
+    call("GET", "/api/v1/bootstrap", params={"date": today})
+    call("POST", "/api/v1/tasks", json={"title": tenant, "estimate_pomodoros": 1})
+    session = call("POST", "/api/v1/sessions/start", json={"kind": "focus"}).json()
+    call("POST", f"/api/v1/sessions/{session['id']}/stop")
+    call("GET", "/api/v1/sessions", params={"from": today, "to": today})
+    call("GET", "/api/v1/tasks")
+
+
+def run(args) -> dict:
+    tenants = [f"tenant-{index:04d}" for index in range(args.tenants)]
+    port = free_port()
+    with tempfile.TemporaryDirectory(prefix="tomate-tenants-") as tmp:
+        env = dict(
+            os.environ,
+            TOMATE_TENANTS_DIR=tmp,
+            TOMATE_MAX_OPEN_TENANTS=str(args.max_open),
+            TOMATE_MAINTENANCE_INTERVAL="0",
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--port", str(port), "--log-level", "warning"],
+            env=env,
+        )
+        peak = {"rss_mb": 0.0, "open_fds": 0}
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(0.2):
+                stats = process_stats(server.pid)
+                for key, value in stats.items():
+                    peak[key] = max(peak[key], value)
+
+        try:
+            base = f"http://127.0.0.1:{port}"
+            with httpx.Client(base_url=base) as client:
+                for _ in range(100):
+                    try:
+                        client.get("/metrics")
+                        break
+                    except httpx.TransportError:
+                        time.sleep(0.1)
+                sampler = threading.Thread(target=sample, daemon=True)
+                sampler.start()
+                idle = process_stats(server.pid)
+                limits = httpx.Limits(max_connections=args.concurrency)
+                rounds = []
+                with httpx.Client(base_url=base, limits=limits, timeout=60) as pool:
+                    for round_no in range(args.rounds):
+                        order = random.sample(tenants, len(tenants))
+                        timings: list = []
+                        started = time.perf_counter()
+                        with ThreadPoolExecutor(args.concurrency) as executor:
+                            for future in [
+                                executor.submit(visit, pool, tenant, timings)
+                                for tenant in order
+                            ]:
+                                future.result()
+                        elapsed = time.perf_counter() - started
+                        rounds.append(
+                            {
+                                "round": round_no + 1,
+                                "seconds": elapsed,
+                                "requests_per_s": len(timings) / elapsed,
+                                **percentiles(timings),
+                            }
+                        )
+                        print(json.dumps(rounds[-1]), file=sys.stderr)
+                    # Every tenant saw exactly its own writes.
+                    for tenant in random.sample(tenants, min(20, len(tenants))):
+                        titles = {
+                            task["title"]
+                            for task in pool.get(
+                                "/api/v1/tasks", headers={"X-Tomate-Tenant": tenant}
+                            ).json()
+                        }
+                        assert titles == {tenant}, (tenant, titles)
+                stop.set()
+                final = process_stats(server.pid)
+        finally:
+            stop.set()
+            server.terminate()
+            server.wait()
+    return {
+        "tenants": args.tenants,
+        "max_open": args.max_open,
+        "concurrency": args.concurrency,
+        "rounds": rounds,
+        "server_idle": idle,
+        "server_peak": peak,
+        "server_final": final,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.tenants")
+    parser.add_argument("--tenants", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--max-open", type=int, default=128)
+    args = parser.parse_args(argv)
+    json.dump(run(args), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Shared setup: the app runs on a temp SQLite file, in sync mode.
+
+The engine is bound to TOMATE_DATABASE_URL when ``app.db`` is imported,
+so the environment is set here, before any test module imports the app.
+"""
+
+import os
+import tempfile
+
+import pytest
+
+_tmp = tempfile.TemporaryDirectory(prefix="tomate-tests-")
+os.environ["TOMATE_DATABASE_URL"] = f"sqlite:///{_tmp.name}/app.db"
+os.environ["TOMATE_MAINTENANCE_INTERVAL"] = "0"
+os.environ["TOMATE_DB_MODE"] = "sync"
+os.environ.pop("TOMATE_TENANTS_DIR", None)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as client:  # runs the lifespan, hence migrations
+        client.get("/api/v1/settings")  # creates the settings and pause cards
+        yield client
@@ -0,0 +1,104 @@
+"""Peak RSS of a session export stays flat however large the range is.
+
+Opt-in (TOMATE_SLOW_TESTS=1): seeds 1M sessions, then streams the whole
+range from a uvicorn subprocess and compares the server's peak RSS
+(VmHWM) before and after. The TestClient can't be used, as it buffers
+whole response bodies. mmap is off and the page cache small so the
+reading of a large file doesn't count as memory the export holds.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+from benchmarks.tenants import free_port
+
+SESSIONS = 1_000_000
+# Allowed growth of the server's peak RSS over the full export.
+MAX_GROWTH_KB = 16 * 1024
+
+pytestmark = [
+    pytest.mark.skipif(
+        not os.getenv("TOMATE_SLOW_TESTS"), reason="set TOMATE_SLOW_TESTS=1"
+    ),
+    pytest.mark.skipif(
+        not os.path.exists("/proc/self/status"), reason="reads /proc/<pid>/status"
+    ),
+]
+
+
+def peak_rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    raise RuntimeError("VmHWM not found")
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    path = tmp_path_factory.mktemp("export") / "app.db"
+    env = dict(
+        os.environ,
+        TOMATE_DATABASE_URL=f"sqlite:///{path}",
+        TOMATE_MAINTENANCE_INTERVAL="0",
+        TOMATE_SQLITE_MMAP_SIZE="0",
+        TOMATE_SQLITE_CACHE_SIZE="-2048",
+    )
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from app import migrations; from app.db import engine; "
+            "from benchmarks.seed import seed; "
+            f"migrations.migrate(engine); seed({SESSIONS})",
+        ],
+        env=env,
+        check=True,
+    )
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=600) as client:
+            for _ in range(100):
+                try:
+                    client.get("/metrics")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            yield process.pid, client
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def export(client, fmt: str, from_date: str, to_date: str) -> int:
+    """Stream an export to nowhere; returns its number of lines."""
+    lines = 0
+    params = {"from": from_date, "to": to_date, "format": fmt}
+    with client.stream("GET", "/api/v1/sessions/export", params=params) as response:
+        response.raise_for_status()
+        for chunk in response.iter_bytes():
+            lines += chunk.count(b"\n")
+    return lines
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_full_export_keeps_peak_rss_flat(server, fmt):
+    pid, client = server
+    # Warm up: same code path over a single day.
+    export(client, fmt, "2999-01-01", "2999-01-01")
+    before = peak_rss_kb(pid)
+    lines = export(client, fmt, "0000-01-01", "9999-12-31")
+    growth = peak_rss_kb(pid) - before
+    header = 1 if fmt == "csv" else 0
+    assert lines == SESSIONS + header
+    assert growth < MAX_GROWTH_KB, f"peak RSS grew by {growth} KiB"
@@ -0,0 +1,146 @@
+"""A database created by the first release migrates to LATEST intact.
+
+The schema below is what that release's models created; the test fills
+it, migrates it, and syncs it from scratch through /changes.
+"""
+
+import pytest
+
+from app import migrations
+from app.db import Database, using
+from app.main import app, get_db
+
+BASELINE_SCHEMA = """
+CREATE TABLE settings (
+    id INTEGER NOT NULL PRIMARY KEY,
+    dayparts_json TEXT NOT NULL,
+    default_focus_minutes INTEGER NOT NULL,
+    default_break_minutes INTEGER NOT NULL,
+    notifications_enabled BOOLEAN NOT NULL,
+    sound_enabled BOOLEAN NOT NULL,
+    created_at DATETIME,
+    updated_at DATETIME
+);
+CREATE INDEX ix_settings_id ON settings (id);
+CREATE TABLE daily_state (
+    date VARCHAR NOT NULL PRIMARY KEY,
+    pause_due_minutes INTEGER NOT NULL
+);
+CREATE TABLE tasks (
+    id INTEGER NOT NULL PRIMARY KEY,
+    title VARCHAR NOT NULL,
+    estimate_pomodoros INTEGER NOT NULL,
+    note TEXT,
+    status VARCHAR NOT NULL,
+    created_at DATETIME,
+    updated_at DATETIME
+);
+CREATE INDEX ix_tasks_id ON tasks (id);
+CREATE TABLE pause_cards (
+    id INTEGER NOT NULL PRIMARY KEY,
+    name VARCHAR NOT NULL,
+    daily_quota INTEGER NOT NULL,
+    is_joker BOOLEAN NOT NULL,
+    created_at DATETIME
+);
+CREATE INDEX ix_pause_cards_id ON pause_cards (id);
+CREATE TABLE sessions (
+    id INTEGER NOT NULL PRIMARY KEY,
+    kind VARCHAR NOT NULL,
+    task_id INTEGER REFERENCES tasks (id),
+    start_at DATETIME NOT NULL,
+    end_at DATETIME,
+    planned_minutes INTEGER NOT NULL,
+    actual_minutes INTEGER,
+    state VARCHAR NOT NULL,
+    title VARCHAR,
+    note TEXT,
+    date VARCHAR NOT NULL,
+    daypart_name VARCHAR NOT NULL
+);
+CREATE INDEX ix_sessions_id ON sessions (id);
+CREATE TABLE pause_card_uses (
+    id INTEGER NOT NULL PRIMARY KEY,
+    pause_card_id INTEGER NOT NULL REFERENCES pause_cards (id),
+    date VARCHAR NOT NULL,
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    used_at DATETIME
+);
+CREATE INDEX ix_pause_card_uses_id ON pause_card_uses (id);
+"""
+
+BASELINE_ROWS = """
+INSERT INTO settings VALUES (1, '[{"name": "Matin", "start": "08:00", "end": "12:00"}]',
+    45, 5, 1, 1, '2024-01-01 08:00:00', '2024-01-01 08:00:00');
+INSERT INTO daily_state VALUES ('2024-01-02', 5), ('2024-01-03', 0);
+INSERT INTO tasks VALUES
+    (1, 'Write', 2, NULL, 'active', '2024-01-01 08:00:00', '2024-01-01 08:00:00'),
+    (2, 'Read', 1, 'notes', 'active', '2024-01-01 08:00:00', '2024-01-01 08:00:00'),
+    (3, 'Plan', 1, NULL, 'done', '2024-01-01 08:00:00', '2024-01-01 08:00:00');
+INSERT INTO pause_cards VALUES
+    (1, 'Walk', 1, 0, '2024-01-01 08:00:00'),
+    (2, 'Coffee', 2, 0, '2024-01-01 08:00:00'),
+    (3, 'Stretch', 1, 0, '2024-01-01 08:00:00'),
+    (4, 'Joker', 1, 1, '2024-01-01 08:00:00');
+INSERT INTO sessions VALUES
+    (1, 'focus', 1, '2024-01-02 08:00:00', '2024-01-02 08:45:00', 45, 45, 'done',
+     NULL, NULL, '2024-01-02', 'Matin'),
+    (2, 'break', NULL, '2024-01-02 08:45:00', NULL, 5, NULL, 'planned',
+     NULL, NULL, '2024-01-02', 'Matin');
+INSERT INTO pause_card_uses VALUES (1, 2, '2024-01-02', 1, '2024-01-02 08:50:00');
+"""
+
+EXPECTED = {
+    "settings": [1],
+    "tasks": [1, 2, 3],
+    "sessions": [1, 2],
+    "pause_cards": [1, 2, 3, 4],
+    "pause_card_uses": [1],
+    "daily_state": ["2024-01-02", "2024-01-03"],
+}
+
+
+@pytest.fixture
+def baseline_database(tmp_path):
+    database = Database(f"sqlite:///{tmp_path}/app.db")
+    raw = database.engine.raw_connection()
+    try:
+        raw.executescript(BASELINE_SCHEMA + BASELINE_ROWS)
+        raw.commit()
+    finally:
+        raw.close()
+    with using(database):
+        assert migrations.migrate(database.engine) == migrations.LATEST
+    yield database
+    database.engine.dispose()
+
+
+def test_changes_since_zero_returns_every_baseline_row(client, baseline_database):
+    async def baseline_db():
+        db = baseline_database.session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = baseline_db
+    try:
+        payload = client.get("/api/v1/changes", params={"since": 0}).json()
+    finally:
+        del app.dependency_overrides[get_db]
+    assert not payload["has_more"]
+    assert payload["deleted"] == {}
+    keys = {
+        table: sorted(row["date" if table == "daily_state" else "id"] for row in rows)
+        for table, rows in payload["changed"].items()
+    }
+    assert keys == EXPECTED
+    # Writes after the upgrade are numbered above the backfill.
+    with baseline_database.engine.begin() as conn:
+        backfilled = conn.exec_driver_sql("SELECT MAX(version) FROM row_versions")
+        last = backfilled.scalar()
+        conn.exec_driver_sql("UPDATE tasks SET title = 'Rewrite' WHERE id = 1")
+        stamp = conn.exec_driver_sql(
+            "SELECT version FROM row_versions WHERE table_name = 'tasks' AND row_key = '1'"
+        )
+        assert stamp.scalar() == last + 1
@@ -0,0 +1,128 @@
+"""Every endpoint reaches its rows through an index, never a table scan.
+
+Each case of the benchmark suite runs once on a seeded database while
+every statement it sends is checked with EXPLAIN QUERY PLAN, on the same
+connection so attached archives resolve. A plan row that scans a table
+fails the test, except for the few tables read whole by design.
+"""
+
+import re
+
+import pytest
+from sqlalchemy import event
+
+from app import archive
+from app.db import Base, engine
+from benchmarks.run import endpoint_cases
+from benchmarks.seed import seed
+
+# Plan rows allowed to scan.
+WHOLE_TABLE_READS = {
+    # A single row.
+    "SCAN settings",
+    # A handful of rows, always listed whole.
+    "SCAN pause_cards",
+    "SCAN day_templates USING INDEX sqlite_autoindex_day_templates_1",
+    # The task list: newest first along the index, stopped by its limit.
+    "SCAN tasks USING INDEX ix_tasks_created_at",
+}
+# SCAN rows of anything else (VALUES lists, subqueries, FTS) aren't tables.
+TABLE_SCAN = re.compile(
+    r"^SCAN (?:\w+\.)?(%s)\b" % "|".join(map(re.escape, Base.metadata.tables))
+)
+# Cases that send no SQL: the backup API copies pages, not rows.
+NO_SQL = {"GET /export/sqlite"}
+STATEMENT = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+ARCHIVED_DAY = "2001-03-01"
+
+
+def archived_cases(client):
+    """Reads that UNION an attached archive with the hot table."""
+    for _ in range(3):
+        planned = client.post(
+            "/api/v1/sessions/plan",
+            json={
+                "kind": "focus",
+                "date": ARCHIVED_DAY,
+                "daypart_name": "Matin",
+                "planned_time": "09:00",
+            },
+        ).json()
+        client.post(f"/api/v1/sessions/{planned['id']}/skip")
+    assert archive.archive_sessions(days=30)[2001] == 3
+    year = {"from": "2001-01-01", "to": "2001-12-31"}
+    return {
+        "GET /sessions (archived year)": lambda: client.get(
+            "/api/v1/sessions", params=year
+        ),
+        "GET /sessions/export (archived year)": lambda: client.get(
+            "/api/v1/sessions/export", params=year
+        ),
+        "GET /bootstrap (archived day)": lambda: client.get(
+            "/api/v1/bootstrap", params={"date": ARCHIVED_DAY}
+        ),
+        "GET /stats (archived year)": lambda: client.get(
+            "/api/v1/stats", params={**year, "group_by": "month"}
+        ),
+    }
+
+
+@pytest.fixture(scope="module")
+def plans(client):
+    """{case name: [(plan row, statement)]} for every SQL statement sent."""
+    seed(2000)
+    cases = endpoint_cases(client)
+    current = {"name": None}
+    recorded: dict = {}
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if current["name"] is None or not STATEMENT.match(statement):
+            return
+        if isinstance(parameters, list):  # executemany; not insertmanyvalues
+            parameters = parameters[0]
+        rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        recorded[current["name"]].extend(
+            (row[3], statement) for row in rows
+        )
+
+    def run(name, call, prepare=None):
+        argument = prepare() if prepare else None
+        recorded[name] = []
+        current["name"] = name
+        try:
+            response = call(argument) if prepare else call()
+        finally:
+            current["name"] = None
+        assert response.status_code < 400, f"{name}: {response.text[:200]}"
+
+    event.listen(engine, "before_cursor_execute", explain)
+    try:
+        for name, case in cases.items():
+            run(name, *(case if isinstance(case, tuple) else (case,)))
+        for name, call in archived_cases(client).items():
+            run(name, call)
+    finally:
+        event.remove(engine, "before_cursor_execute", explain)
+    return recorded
+
+
+def test_every_case_was_explained(plans):
+    assert [name for name, rows in plans.items() if not rows] == sorted(NO_SQL)
+
+
+def test_no_table_scans(plans):
+    scans = [
+        f"{name}: {detail}\n    {' '.join(statement.split())[:200]}"
+        for name, rows in plans.items()
+        for detail, statement in rows
+        if TABLE_SCAN.match(detail) and detail not in WHOLE_TABLE_READS
+    ]
+    assert not scans, "table scans:\n" + "\n".join(scans)
+
+
+def test_archived_reads_use_the_archive_index(plans):
+    details = [detail for detail, _ in plans["GET /sessions (archived year)"]]
+    assert any(
+        "archive_2001" in detail or "ix_sessions_date_start_at" in detail
+        for detail in details
+    ), details
@@ -1,34 +1,77 @@
 const API_BASE = import.meta.env.VITE_API_BASE || "http://localhost:8000/api/v1";
 
+// Last ETag and body per GET path, replayed when the server answers 304.
+const etagCache = new Map();
+
 async function request(path, options = {}) {
+  const isGet = !options.method || options.method === "GET";
+  const cached = isGet ? etagCache.get(path) : null;
   const res = await fetch(`${API_BASE}${path}`, {
+    ...options,
     headers: {
       "Content-Type": "application/json",
+      ...(cached ? { "If-None-Match": cached.etag } : {}),
       ...(options.headers || {})
-    },
-    ...options
+    }
   });
+  if (res.status === 304 && cached) {
+    return cached.body;
+  }
   if (!res.ok) {
     const text = await res.text();
     throw new Error(text || "Request failed");
   }
   if (res.headers.get("content-type")?.includes("application/json")) {
-    return res.json();
+    const body = await res.json();
+    const etag = res.headers.get("ETag");
+    if (isGet && etag) {
+      etagCache.set(path, { etag, body });
+    }
+    return body;
   }
   return res;
 }
 
+async function requestPage(path) {
+  const res = await fetch(`${API_BASE}${path}`, { headers: { "Content-Type": "application/json" } });
+  if (!res.ok) {
+    const text = await res.text();
+    throw new Error(text || "Request failed");
+  }
+  return { items: await res.json(), next: res.headers.get("X-Next-Cursor") };
+}
+
+// Fetches every page of a keyset-paginated list, `limit` rows at a time.
+async function requestAll(path, limit = 500) {
+  const separator = path.includes("?") ? "&" : "?";
+  const items = [];
+  let cursor = null;
+  do {
+    const after = cursor ? `&after=${encodeURIComponent(cursor)}` : "";
+    const page = await requestPage(`${path}${separator}limit=${limit}${after}`);
+    items.push(...page.items);
+    cursor = page.next;
+  } while (cursor);
+  return items;
+}
+
 export const api = {
+  bootstrap: (date) => request(`/bootstrap${date ? `?date=${date}` : ""}`),
   getSettings: () => request("/settings"),
   updateSettings: (payload) => request("/settings", { method: "PUT", body: JSON.stringify(payload) }),
   getDailyState: (date) => request(`/daily-state${date ? `?date=${date}` : ""}`),
   listTasks: (status) => request(`/tasks${status ? `?status=${status}` : ""}`),
+  listTasksPaged: (status, limit) => requestAll(`/tasks${status ? `?status=${status}` : ""}`, limit),
   createTask: (payload) => request("/tasks", { method: "POST", body: JSON.stringify(payload) }),
   updateTask: (id, payload) => request(`/tasks/${id}`, { method: "PUT", body: JSON.stringify(payload) }),
   completeTask: (id) => request(`/tasks/${id}/complete`, { method: "POST" }),
   listSessions: (from, to) => request(`/sessions?from=${from}&to=${to}`),
+  listSessionsPaged: (from, to, limit) => requestAll(`/sessions?from=${from}&to=${to}`, limit),
   startSession: (payload) => request("/sessions/start", { method: "POST", body: JSON.stringify(payload) }),
   planSession: (payload) => request("/sessions/plan", { method: "POST", body: JSON.stringify(payload) }),
+  nextSlot: (params) => request(`/sessions/next-slot?${new URLSearchParams(params)}`),
+  planDay: (template, params) =>
+    request(`/sessions/plan-day?${new URLSearchParams({ template, ...params })}`, { method: "POST" }),
   startPlannedSession: (id) => request(`/sessions/${id}/start`, { method: "POST" }),
   stopSession: (id) => request(`/sessions/${id}/stop`, { method: "POST" }),
   skipSession: (id) => request(`/sessions/${id}/skip`, { method: "POST" }),
@@ -40,9 +83,96 @@ export const api = {
   listPauseCards: () => request("/pause-cards"),
   createPauseCard: (payload) => request("/pause-cards", { method: "POST", body: JSON.stringify(payload) }),
   updatePauseCard: (id, payload) => request(`/pause-cards/${id}`, { method: "PUT", body: JSON.stringify(payload) }),
-  consumePause: (payload) => request("/pause/consume", { method: "POST", body: JSON.stringify(payload) })
+  listDayTemplates: () => request("/day-templates"),
+  createDayTemplate: (payload) => request("/day-templates", { method: "POST", body: JSON.stringify(payload) }),
+  updateDayTemplate: (id, payload) =>
+    request(`/day-templates/${id}`, { method: "PUT", body: JSON.stringify(payload) }),
+  consumePause: (payload) => request("/pause/consume", { method: "POST", body: JSON.stringify(payload) }),
+  batch: (operations) => request("/batch", { method: "POST", body: JSON.stringify({ operations }) })
 };
 
 export function downloadExport() {
   window.location.href = `${API_BASE}/export/sqlite`;
 }
+
+export function subscribeEvents(onEvent) {
+  const source = new EventSource(`${API_BASE}/events`);
+  let opened = false;
+  source.onopen = () => {
+    // Anything may have changed while the stream was down.
+    if (opened) onEvent({ entity: "resync", action: "resync" });
+    opened = true;
+  };
+  source.onmessage = (message) => {
+    try {
+      onEvent(JSON.parse(message.data));
+    } catch (err) {
+      return;
+    }
+  };
+  return () => source.close();
+}
+
+function upsertById(listRef, item, { prepend = false } = {}) {
+  const index = listRef.value.findIndex((entry) => entry.id === item.id);
+  if (index === -1) {
+    listRef.value = prepend ? [item, ...listRef.value] : [...listRef.value, item];
+  } else {
+    listRef.value = listRef.value.map((entry, i) => (i === index ? { ...entry, ...item } : entry));
+  }
+}
+
+function removeById(listRef, id) {
+  listRef.value = listRef.value.filter((entry) => entry.id !== id);
+}
+
+function byStartAt(a, b) {
+  if (a.start_at === b.start_at) return a.id - b.id;
+  return a.start_at < b.start_at ? -1 : 1;
+}
+
+// Applies one change event (from the stream or from a mutation response) to
+// the refs in `store`: settings, tasks, sessions, pauseCards, dailyState and
+// selectedDate. Returns false when the event cannot be applied locally.
+export function applyEvent(store, event) {
+  const { entity, action, data } = event;
+  switch (entity) {
+    case "settings":
+      store.settings.value = { ...store.settings.value, ...data, needs_setup: false };
+      return true;
+    case "task":
+      upsertById(store.tasks, data, { prepend: true });
+      return true;
+    case "pause_card":
+      upsertById(store.pauseCards, data);
+      return true;
+    case "session":
+      if (action === "deleted" || data.date !== store.selectedDate.value) {
+        removeById(store.sessions, event.id);
+      } else {
+        upsertById(store.sessions, data);
+        store.sessions.value = [...store.sessions.value].sort(byStartAt);
+      }
+      return true;
+    case "daily_state":
+      if (data.date === store.selectedDate.value) store.dailyState.value = data;
+      return true;
+    case "day":
+      if (data.date !== store.selectedDate.value) return true;
+      store.sessions.value = store.sessions.value.filter((session) => {
+        if (data.mode === "all") return false;
+        if (data.mode === "history") return session.state === "planned";
+        return session.state !== "planned";
+      });
+      return true;
+    case "pause_cards":
+      if (data.date !== new Date().toISOString().slice(0, 10)) return true;
+      store.pauseCards.value = store.pauseCards.value.map((card) => ({
+        ...card,
+        remaining_today: card.daily_quota
+      }));
+      return true;
+    default:
+      return false;
+  }
+}